@@ -0,0 +1,223 @@
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from itertools import islice
+from corpus import CorpusStore
+from project import build_full_graph
+from hyphenator import ENGINES, load_patterns, batch_break_positions
+from hyphenator import map_chunks, break_positions_chunk
+from hyphenator import hyphen_histogram, syllable_pair_counts
+
+
+def read_word_list(file_name, limit=None):
+    with open(file_name) as file:
+        words = [line.strip() for line in file if line.strip()]
+    return words[:limit] if limit else words
+
+
+def long_words(words, count, parts=(3, 6), seed=0):
+    """Make a synthetic corpus of long words by gluing random words."""
+    rand = random.Random(seed)
+    return ["".join(rand.choice(words) for _ in range(rand.randint(*parts)))
+            for _ in range(count)]
+
+
+def timed(function, *args, **kwargs):
+    """Run function once, return (result, seconds)."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function, *args, **kwargs):
+    """Run function once under tracemalloc, return peak traced bytes.
+
+    Tracing slows Python down several times, so this is kept separate
+    from the timed run.
+    """
+    tracemalloc.start()
+    function(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def available_engines():
+    """Return the engines that can be built in this environment."""
+    engines = []
+    for engine in ENGINES:
+        try:
+            load_patterns(engine=engine, cache=False)
+        except ImportError:
+            continue
+        engines.append(engine)
+    return engines
+
+
+def match_words(words, trie, batch_size=4096):
+    for start in range(0, len(words), batch_size):
+        batch_break_positions(words[start:start + batch_size], trie)
+
+
+def bench_build(engines):
+    results = {}
+    for engine in engines:
+        _, seconds = timed(load_patterns, engine=engine, cache=False)
+        peak = peak_memory(load_patterns, engine=engine, cache=False)
+        results[engine] = {"seconds": seconds, "peak_bytes": peak}
+    # The default engine can also be memory-mapped from its cache
+    load_patterns()
+    _, seconds = timed(load_patterns)
+    results["cached"] = {"seconds": seconds, "peak_bytes": peak_memory(
+        load_patterns)}
+    return results
+
+
+def bench_match(engines, corpora, memory_sample):
+    results = {}
+    for corpus, words in corpora.items():
+        results[corpus] = {}
+        for engine in engines:
+            trie = load_patterns(engine=engine)
+            _, seconds = timed(match_words, words, trie)
+            peak = peak_memory(match_words, words[:memory_sample], trie)
+            results[corpus][engine] = {
+                "words": len(words),
+                "seconds": seconds,
+                "words_per_second": len(words) / seconds,
+                "peak_bytes": peak,
+            }
+    return results
+
+
+def bench_aggregate(words, workers, memory_sample):
+    results = {}
+    stages = {
+        "hyphen_histogram": hyphen_histogram,
+        "syllable_pair_counts": syllable_pair_counts,
+    }
+    for name, function in stages.items():
+        _, seconds = timed(function, words, workers=workers)
+        peak = peak_memory(function, words[:memory_sample], workers=workers)
+        results[name] = {
+            "words": len(words),
+            "workers": workers,
+            "seconds": seconds,
+            "words_per_second": len(words) / seconds,
+            "peak_bytes": peak,
+        }
+    return results
+
+
+def bench_graph_scaling(words, workers, steps=4):
+    """Time the full-vocabulary graph build over growing prefixes of the
+    syllabified words, halving the size at each step.
+
+    The words are syllabified into an in-memory CorpusStore, so nothing is
+    written next to the word file.
+    """
+    positions = []
+    for chunk in map_chunks(break_positions_chunk, words, workers=workers):
+        positions.extend(chunk)
+    store = CorpusStore.build(words, positions)
+    results = []
+    for step in reversed(range(steps)):
+        size = len(store) >> step
+        graph, seconds = timed(build_full_graph, islice(store, size))
+        peak = peak_memory(build_full_graph, islice(store, size))
+        edges = sum(len(vertex.neighbors) for vertex in graph)
+        results.append({
+            "words": size,
+            "vertices": graph.num_vertices,
+            "edges": edges,
+            "seconds": seconds,
+            "peak_bytes": peak,
+        })
+    return results
+
+
+def print_report(report, previous=None):
+    """Print throughput per engine, relative to the original trie engine."""
+    for corpus, engines in report["match"].items():
+        print(f"{corpus}:")
+        baseline = engines.get("trie", {}).get("words_per_second")
+        for engine, result in engines.items():
+            line = (f"  {engine:<14}{result['words_per_second']:>12.0f} "
+                    f"words/s {result['peak_bytes'] / 2**20:>8.2f} MiB")
+            if baseline:
+                line += f"  x{result['words_per_second'] / baseline:.2f}"
+            if previous:
+                old = previous.get("match", {}).get(corpus, {}).get(engine)
+                # Compare throughput, so runs over a different number of
+                # words (--limit, --long-words) stay comparable
+                if old:
+                    change = (result["words_per_second"]
+                              / old["words_per_second"] - 1)
+                    line += f"  ({change:+.1%} words/s vs previous)"
+            print(line)
+    for stage, result in report["build"].items():
+        print(f"build {stage:<14}{result['seconds'] * 1000:>10.1f} ms "
+              f"{result['peak_bytes'] / 2**20:>8.2f} MiB")
+    for stage, result in report["aggregate"].items():
+        print(f"{stage:<22}{result['words_per_second']:>12.0f} words/s "
+              f"{result['peak_bytes'] / 2**20:>8.2f} MiB")
+    for result in report.get("graph", []):
+        print(f"graph {result['words']:>8} words {result['vertices']:>7} "
+              f"vertices {result['edges']:>8} edges "
+              f"{result['seconds']:>7.2f} s "
+              f"{result['peak_bytes'] / 2**20:>8.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hyphenation engines.")
+    parser.add_argument("--words", default="enable1.txt")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only use the first LIMIT words")
+    parser.add_argument("--long-words", type=int, default=20000,
+                        help="size of the synthetic long-word corpus")
+    parser.add_argument("--engines", nargs="*", default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--memory-sample", type=int, default=5000,
+                        help="words used when measuring peak memory")
+    parser.add_argument("--graph-steps", type=int, default=4,
+                        help="corpus sizes for the full graph build")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None,
+                        help="previous results file to compare against")
+    args = parser.parse_args()
+
+    words = read_word_list(args.words, args.limit)
+    corpora = {
+        args.words: words,
+        "long words": long_words(words, args.long_words),
+    }
+    engines = args.engines or available_engines()
+
+    report = {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "engines": engines,
+        "build": bench_build(engines),
+        "match": bench_match(engines, corpora, args.memory_sample),
+        "aggregate": bench_aggregate(words, args.workers,
+                                     args.memory_sample),
+        "graph": bench_graph_scaling(words, args.workers, args.graph_steps),
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_report(report, previous)
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from collections import Counter, deque
+from itertools import islice
+from hyphenator import load_patterns, map_chunks, break_positions_chunk
+from hyphenator import count_pairs, read_words, syllable_spans
+
+# magic, pattern digest, word file digest, tag, then the lengths of the
+# word offsets, word bytes, break offsets and breaks arrays
+HEADER = struct.Struct("=8s32s32s32s4q")
+MAGIC = b"SYLCORP2"
+# Where the tag is in the header, see tag_store
+TAG_OFFSET = struct.calcsize("=8s32s32s")
+
+
+def file_digest(file_name):
+    """Return the SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def tag_store(file_name, tag):
+    """Set the tag of a saved store in place.
+
+    The tag is 32 bytes for whoever keeps the store as a snapshot, to tie
+    it to what they derived from it. Stores are written with an empty tag.
+    """
+    with open(file_name, "r+b") as file:
+        file.seek(TAG_OFFSET)
+        file.write(struct.pack("32s", tag))
+
+
+def write_entries(file, entries, pattern_digest=b"", words_digest=b"",
+                  tag=b"", block_size=4096):
+    """Write (word, break positions) entries to an open binary file in the
+    CorpusStore format, block_size entries at a time.
+
+    The word offsets go straight after the header. The other arrays are
+    spooled to temporary files and appended once their sizes are known.
+    """
+    entries = iter(entries)
+    file.write(bytes(HEADER.size))
+    with tempfile.TemporaryFile() as break_offsets_file, \
+            tempfile.TemporaryFile() as word_bytes_file, \
+            tempfile.TemporaryFile() as breaks_file:
+        array("q", [0]).tofile(file)
+        array("q", [0]).tofile(break_offsets_file)
+        count = total_bytes = total_breaks = 0
+        for block in iter(lambda: list(islice(entries, block_size)), []):
+            word_offsets = array("q")
+            word_bytes = bytearray()
+            break_offsets = array("q")
+            breaks = array("H")
+            for word, positions in block:
+                word_bytes += word.encode()
+                word_offsets.append(total_bytes + len(word_bytes))
+                breaks.extend(positions)
+                break_offsets.append(total_breaks + len(breaks))
+            word_offsets.tofile(file)
+            break_offsets.tofile(break_offsets_file)
+            word_bytes_file.write(word_bytes)
+            breaks.tofile(breaks_file)
+            count += len(block)
+            total_bytes += len(word_bytes)
+            total_breaks += len(breaks)
+        for spool in (break_offsets_file, word_bytes_file, breaks_file):
+            spool.seek(0)
+            shutil.copyfileobj(spool, file)
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, pattern_digest, words_digest, tag,
+                           count + 1, total_bytes, count + 1, total_breaks))
+    file.flush()
+
+
+class CorpusStore:
+    """A syllabified word list kept in flat, memory-mappable arrays.
+
+    word_offsets: start of each word in word_bytes (plus the end offset)
+    word_bytes: the UTF-8 encoded words, back to back
+    break_offsets: start of each word's break positions in breaks
+    breaks: the break positions of every word, back to back
+    """
+
+    def __init__(self, word_offsets, word_bytes, break_offsets, breaks,
+                 pattern_digest=b"", words_digest=b"", tag=b""):
+        self.word_offsets = word_offsets
+        self.word_bytes = word_bytes
+        self.break_offsets = break_offsets
+        self.breaks = breaks
+        self.pattern_digest = pattern_digest
+        self.words_digest = words_digest
+        self.tag = tag
+
+    def __len__(self):
+        return len(self.word_offsets) - 1
+
+    def __iter__(self):
+        """Iterate over (word, break positions) of every word."""
+        for index in range(len(self)):
+            yield self.word(index), self.break_positions(index)
+
+    def word(self, index):
+        start = self.word_offsets[index]
+        end = self.word_offsets[index + 1]
+        return bytes(self.word_bytes[start:end]).decode()
+
+    def break_positions(self, index):
+        start = self.break_offsets[index]
+        end = self.break_offsets[index + 1]
+        return list(self.breaks[start:end])
+
+    @classmethod
+    def build(cls, words, positions, pattern_digest=b"", words_digest=b""):
+        """Create a store from words and their break positions."""
+        word_offsets = array("q", [0])
+        word_bytes = bytearray()
+        break_offsets = array("q", [0])
+        breaks = array("H")
+        for word, word_breaks in zip(words, positions):
+            word_bytes += word.encode()
+            word_offsets.append(len(word_bytes))
+            breaks.extend(word_breaks)
+            break_offsets.append(len(breaks))
+        return cls(word_offsets, word_bytes, break_offsets, breaks,
+                   pattern_digest, words_digest)
+
+    def save(self, file_name):
+        """Write the store to file_name, replacing it atomically."""
+        temp_name = f"{file_name}.{os.getpid()}.tmp"
+        with open(temp_name, "wb") as file:
+            write_entries(file, self, self.pattern_digest, self.words_digest,
+                          self.tag)
+        os.replace(temp_name, file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        """Memory-map a saved store, or return None if it is unreadable."""
+        try:
+            with open(file_name, "rb") as file:
+                return cls.map(file)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def map(cls, file):
+        """Memory-map the store written to an open file, or return None if
+        it is not one."""
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < HEADER.size:
+            return None
+        magic, pattern_digest, words_digest, tag, *lengths = \
+            HEADER.unpack_from(buffer)
+        word_offsets, word_bytes, break_offsets, breaks = lengths
+        sizes = [("q", word_offsets), ("q", break_offsets),
+                 ("B", word_bytes), ("H", breaks)]
+        expected = HEADER.size + sum(array(code).itemsize * length
+                                     for code, length in sizes)
+        if magic != MAGIC or len(buffer) != expected:
+            return None
+
+        view = memoryview(buffer)
+        tables = []
+        offset = HEADER.size
+        for code, length in sizes:
+            end = offset + array(code).itemsize * length
+            tables.append(view[offset:end].cast(code))
+            offset = end
+        store = cls(tables[0], tables[2], tables[1], tables[3],
+                    pattern_digest, words_digest, tag)
+        # Keep the mapping alive for as long as the store uses it
+        store.buffer = buffer
+        return store
+
+    def syllable_pairs(self, syllables=None):
+        """Return a Counter of adjacent syllable pairs, like
+        hyphenator.syllable_pair_counts, in first-seen order."""
+        return count_pairs(self, syllables)
+
+    def hyphen_histogram(self):
+        """Return a Counter of how many words have each number of breaks."""
+        offsets = self.break_offsets
+        return Counter(offsets[index + 1] - offsets[index]
+                       for index in range(len(self)))
+
+    def syllable_counts(self):
+        """Return a Counter of every syllable in the corpus."""
+        counts = Counter()
+        for word, positions in self:
+            counts.update(word[start:end]
+                          for start, end in syllable_spans(word, positions))
+        return counts
+
+
+def update_corpus(word_file="enable1.txt", patterns_file="patterns.txt",
+                  store_file=None, exceptions_file=None, **options):
+    """Bring the stored corpus of word_file up to date.
+
+    Only words that are not in the previous store are hyphenated. Return
+    (store, added, removed), where added and removed list the (word, break
+    positions) of every word occurrence gained or lost since the previous
+    store. If there was no usable previous store (missing, or made with
+    other patterns), added and removed are None.
+
+    An unchanged word file returns the previous store as it is. Otherwise
+    the words are streamed, with their break positions in input order,
+    into store_file (word_file + ".corpus" by default), so only the
+    chunks in flight are held in memory, plus an index of the previous
+    store's words when there is one. Other keyword arguments are passed
+    to hyphenator.map_chunks.
+    """
+    if store_file is None:
+        store_file = word_file + ".corpus"
+    pattern_digest = load_patterns(patterns_file,
+                                   exceptionsFile=exceptions_file).digest
+    words_digest = file_digest(word_file)
+
+    previous = CorpusStore.load(store_file)
+    if previous is not None and previous.pattern_digest != pattern_digest:
+        previous = None
+    if previous is not None and previous.words_digest == words_digest:
+        return previous, [], []
+
+    # Where each word of the previous store occurs, and how many of its
+    # occurrences the word file hasn't accounted for yet
+    stored = {}
+    remaining = Counter()
+    if previous is not None:
+        indices = range(len(previous))
+        stored = {previous.word(index): index for index in indices}
+        remaining.update(map(previous.word, indices))
+    added = Counter()
+    added_positions = {}
+    # The previous store index of each word read, or -1 for the words
+    # being hyphenated, which are also queued in hyphenating
+    order = deque()
+    hyphenating = deque()
+
+    def unknown_words(words):
+        for word in words:
+            index = stored.get(word, -1)
+            if remaining[word] > 0:
+                remaining[word] -= 1
+            elif previous is not None:
+                added[word] += 1
+            order.append(index)
+            if index < 0:
+                hyphenating.append(word)
+                yield word
+
+    def known_entries():
+        while order and order[0] >= 0:
+            index = order.popleft()
+            yield previous.word(index), previous.break_positions(index)
+
+    def entries(words):
+        for chunk in map_chunks(break_positions_chunk, unknown_words(words),
+                                fileName=patterns_file,
+                                exceptionsFile=exceptions_file, **options):
+            for positions in chunk:
+                yield from known_entries()
+                order.popleft()
+                word = hyphenating.popleft()
+                if word in added:
+                    added_positions[word] = positions
+                yield word, positions
+        yield from known_entries()
+
+    temp_name = f"{store_file}.{os.getpid()}.tmp"
+    try:
+        file = open(temp_name, "w+b")
+    except OSError:
+        # The store can't be saved, so keep it in an anonymous file
+        temp_name = None
+        file = tempfile.TemporaryFile()
+    with file, open(word_file) as words:
+        write_entries(file, entries(read_words(words)), pattern_digest,
+                      words_digest)
+        store = CorpusStore.map(file)
+    if temp_name is not None:
+        os.replace(temp_name, store_file)
+
+    if previous is None:
+        return store, None, None
+
+    def break_positions(word):
+        if word in added_positions:
+            return added_positions[word]
+        return previous.break_positions(stored[word])
+
+    added = [(word, break_positions(word))
+             for word, count in added.items() for _ in range(count)]
+    removed = [(word, break_positions(word))
+               for word, count in remaining.items() for _ in range(count)]
+    return store, added, removed
+
+
+def open_corpus(word_file="enable1.txt", patterns_file="patterns.txt",
+                store_file=None, exceptions_file=None, **options):
+    """Return the CorpusStore of word_file, syllabified with patterns_file.
+
+    The store is saved to store_file (word_file + ".corpus" by default) and
+    reused until the word file, pattern file or exceptions file changes;
+    see update_corpus.
+    """
+    return update_corpus(word_file, patterns_file, store_file,
+                         exceptions_file, **options)[0]
@@ -0,0 +1,111 @@
+#!python
+
+from corpus import CorpusStore, open_corpus, update_corpus
+from hyphenator import read_patterns_file, parse_word
+from collections import Counter
+import os
+import shutil
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PATTERNS = os.path.join(HERE, "patterns.txt")
+WORDS = ["hyphenation", "syllable", "a", "table", "generation",
+         "café", "hyphenation"]
+
+
+class CorpusStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.patterns = os.path.join(self.directory, "patterns.txt")
+        shutil.copy(PATTERNS, self.patterns)
+        self.words = os.path.join(self.directory, "words.txt")
+        with open(self.words, "w") as file:
+            file.write("\n".join(WORDS) + "\n")
+        self.trie = read_patterns_file(PATTERNS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        return open_corpus(self.words, self.patterns, workers=1)
+
+    def test_build_and_read(self):
+        store = self.open()
+        assert len(store) == len(WORDS)
+        assert store.word(0) == "hyphenation"
+        assert store.break_positions(0) == [2, 6]
+        assert store.word(5) == "café"
+        for (word, positions), expected in zip(store, WORDS):
+            assert word == expected
+            syllables = parse_word(word, self.trie).split("-")
+            assert len(positions) == len(syllables) - 1
+
+    def test_reused_until_inputs_change(self):
+        self.open()
+        store = self.open()
+        # A store read back from disk is memory-mapped
+        assert isinstance(store.breaks, memoryview)
+        assert store.word(1) == "syllable"
+
+        with open(self.words, "a") as file:
+            file.write("extra\n")
+        store = self.open()
+        assert len(store) == len(WORDS) + 1
+
+        with open(self.patterns, "a") as file:
+            file.write("\nab9le\n")
+        store = self.open()
+        assert store.break_positions(1) == [3, 5, 6]
+
+    def test_update_diffs_word_counts(self):
+        store, added, removed = update_corpus(self.words, self.patterns,
+                                              workers=1)
+        assert added is None and removed is None
+        with open(self.words, "w") as file:
+            file.write("\n".join(WORDS[1:] + ["extra", "table"]) + "\n")
+        store, added, removed = update_corpus(self.words, self.patterns,
+                                              workers=1)
+        assert [word for word, _ in store] == WORDS[1:] + ["extra", "table"]
+        self.assertListEqual(added, [("extra", [2]), ("table", [])])
+        self.assertListEqual(removed, [("hyphenation", [2, 6])])
+
+        with open(self.words, "w") as file:
+            file.write("syllable\na\n")
+        store, added, removed = update_corpus(self.words, self.patterns,
+                                              workers=1)
+        assert [word for word, _ in store] == ["syllable", "a"]
+        self.assertListEqual(added, [])
+        self.assertCountEqual(removed, [
+            ("table", []), ("table", []), ("generation", [3, 5, 6]),
+            ("café", []), ("hyphenation", [2, 6]), ("extra", [2])])
+        assert update_corpus(self.words, self.patterns,
+                             workers=1)[1:] == ([], [])
+
+    def test_corrupt_store_is_rebuilt(self):
+        with open(self.words + ".corpus", "wb") as file:
+            file.write(b"garbage")
+        assert len(self.open()) == len(WORDS)
+        assert CorpusStore.load(self.words + ".corpus") is not None
+
+    def test_aggregates(self):
+        store = self.open()
+        syllables = Counter()
+        pairs = Counter()
+        hyphens = Counter()
+        for word in WORDS:
+            word_syllables = parse_word(word, self.trie).split("-")
+            syllables.update(word_syllables)
+            pairs.update(zip(word_syllables, word_syllables[1:]))
+            hyphens[len(word_syllables) - 1] += 1
+        self.assertDictEqual(store.syllable_counts(), syllables)
+        self.assertDictEqual(store.syllable_pairs(), pairs)
+        self.assertListEqual(list(store.syllable_pairs()), list(pairs))
+        self.assertDictEqual(store.hyphen_histogram(), hyphens)
+        self.assertDictEqual(store.syllable_pairs({"hy", "phen"}),
+                             {("hy", "phen"): 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,182 @@
 #!python
 
+from array import array
+from bisect import bisect_left
 from collections import deque
+from collections.abc import Set
+from itertools import islice, repeat
+from operator import add, lt
+from types import MappingProxyType
+import gzip
+import mmap
+import numbers
 import random
-import string
+import re
+import struct
+
+# How Graph.add_edges treats an edge it is given again
+DUPLICATE_POLICIES = ("error", "sum", "last")
+
+# magic, directed, weighted, vertex id type, weight type, number of
+# vertices, size of the vertex id table in bytes, number of edges
+GRAPH_HEADER = struct.Struct("=8s??cc3q")
+GRAPH_MAGIC = b"SYLGRPH1"
+
+
+# One edge of an edge list file: (from, to) or (from, to, weight)
+EDGE_PATTERN = re.compile(
+    r"\(\s*([^,()\s]+)\s*,\s*([^,()\s]+)\s*(?:,\s*([^,()\s]+)\s*)?\)")
+
+
+def open_text(file_name):
+    """Open a text file for reading, decompressing it if it is gzipped."""
+    with open(file_name, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(file_name, "rt")
+    return open(file_name, "r")
+
+
+def parse_weight(text):
+    """Convert a weight to an int, or a float if it has decimals."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def edge_error(text, position, line_number):
+    """Return a ValueError for the malformed edge at text[position:], where
+    text starts on line line_number of the file."""
+    position = len(text) - len(text[position:].lstrip())
+    line_number += text.count("\n", 0, position)
+    start = text.rfind("\n", 0, position) + 1
+    end = text.find("\n", position)
+    line = text[start:end if end >= 0 else len(text)].strip()
+    return ValueError(f"Malformed edge on line {line_number}: {line!r}")
+
+
+def read_edge_list(file_name, chunk_size=1 << 20, batch_size=65536):
+    """Lazily parse a graph file in the 'G'/'D' edge list format.
+
+    The first line is the graph type, an optional second line lists the
+    vertices separated by commas, and every other line is an edge like
+    (from,to) or (from,to,weight). Yield ("type", "G" or "D") and
+    ("vertices", [ids]) for the header, then ("edges", batch) with lists
+    of up to batch_size (from, to, weight) tuples, where weight is None
+    for unweighted edges. Vertex ids are kept as strings. Raise a
+    ValueError naming the line of any text between the edges that isn't
+    an edge.
+    """
+    with open_text(file_name) as f:
+        # Read the header line by line, until the first edge
+        graph_type = None
+        line_number = 1
+        line = f.readline()
+        while line:
+            line = line.strip()
+            if line == "":
+                pass
+            elif graph_type is None:
+                if line[0] not in "gGdD":
+                    raise ValueError("Looking for type 'G' or 'D'")
+                graph_type = line[0].upper()
+                yield "type", graph_type
+            elif line[0] == "(":
+                break
+            else:
+                yield "vertices", [vertex.strip() for vertex in line.split(",")
+                                   if vertex.strip()]
+            line_number += 1
+            line = f.readline()
+        if graph_type is None:
+            raise ValueError("Looking for type 'G' or 'D'")
+
+        # Parse the edges a chunk of text at a time
+        rest = line + "\n"
+        batch = []
+        while True:
+            chunk = f.read(chunk_size)
+            text = rest + chunk
+            # Keep any partial last line for the next chunk
+            if chunk:
+                cut = text.rfind("\n") + 1
+                text, rest = text[:cut], text[cut:]
+            position = 0
+            for match in EDGE_PATTERN.finditer(text):
+                gap = text[position:match.start()]
+                if gap and not gap.isspace():
+                    raise edge_error(text, position, line_number)
+                position = match.end()
+                from_key, to_key, weight = match.groups()
+                try:
+                    weight = parse_weight(weight) if weight else None
+                except ValueError:
+                    raise edge_error(text, match.start(), line_number) \
+                        from None
+                batch.append((from_key, to_key, weight))
+                if len(batch) >= batch_size:
+                    yield "edges", batch
+                    batch = []
+            if text[position:].strip():
+                raise edge_error(text, position, line_number)
+            line_number += text.count("\n")
+            if not chunk:
+                break
+        if batch:
+            yield "edges", batch
+
+
+def both_ways(edges):
+    """Yield every edge, followed by its reverse unless it is a loop."""
+    for edge in edges:
+        yield edge
+        if edge[0] != edge[1]:
+            yield (edge[1], edge[0]) + tuple(edge[2:])
+
+
+def insert_into_rows(offsets, values, weights, added):
+    """Insert entries into the sorted rows of a compressed sparse row layout.
+
+    added is a sorted list of (row, value, weight). Return new offsets,
+    values and weights arrays. Only the rows that gain entries are sorted
+    again; the others are copied as slices, with their offsets shifted.
+    """
+    new_offsets = offsets[:added[0][0] + 1]
+    new_values = array(values.typecode)
+    new_weights = array(weights.typecode)
+    copied = 0
+    shift = 0
+    pos = 0
+    while pos < len(added):
+        row = added[pos][0]
+        start, end = offsets[row], offsets[row + 1]
+        # Copy the rows since the last one that gained entries
+        new_offsets.extend(map(add, offsets[len(new_offsets):row + 1],
+                               repeat(shift)))
+        new_values += values[copied:start]
+        new_weights += weights[copied:start]
+        entries = list(zip(values[start:end], weights[start:end]))
+        while pos < len(added) and added[pos][0] == row:
+            entries.append(added[pos][1:])
+            pos += 1
+        shift += len(entries) - (end - start)
+        entries.sort()
+        new_values.extend(value for value, _ in entries)
+        new_weights.extend(weight for _, weight in entries)
+        new_offsets.append(end + shift)
+        copied = end
+    new_offsets.extend(map(add, offsets[len(new_offsets):], repeat(shift)))
+    new_values += values[copied:]
+    new_weights += weights[copied:]
+    return new_offsets, new_values, new_weights
 
 
 class Vertex(object):
     """Helper class that defines vertices and vertex neighbors."""
 
+    __slots__ = ("id", "neighbors", "predecessors", "parent")
+
     def __init__(self, vertex_id):
         """Initialize a vertex and its neighbors.
 
@@ -15,9 +184,12 @@ class Vertex(object):
         neighbors: set of vertices adjacent to self, stored in dictionary with:
             key = vertex object
             value = weight of edge between self and neighbor
+        predecessors: the vertices that have self as a neighbor, stored the
+            same way, kept up to date by add_neighbor
         """
         self.id = vertex_id
         self.neighbors = {}
+        self.predecessors = {}
         self.parent = None
 
     def __repr__(self):
@@ -101,12 +273,35 @@ class Vertex(object):
             raise KeyError(f"{vertex.id} is already a neighbor of {self.id}")
         # If not, add vertex to neighbors and assign weight
         self.neighbors[vertex] = weight
+        # Index the edge at the other end too
+        vertex.predecessors[self] = weight
 
     def get_neighbors(self):
         """Return the neighbors of this vertex."""
         # Return the neighbors
         return set(self.neighbors.keys())
 
+    def neighbor_view(self):
+        """Return a read-only view of the neighbors of this vertex.
+
+        Unlike get_neighbors, no set is built: the view supports `in`,
+        len and iteration, and follows later changes to the neighbors.
+        """
+        return self.neighbors.keys()
+
+    def out_degree(self):
+        """Return the number of neighbors of this vertex."""
+        # The neighbor dict keeps its own size, so this is not a count
+        return len(self.neighbors)
+
+    def predecessor_view(self):
+        """Return a read-only view of the vertices leading into this one."""
+        return self.predecessors.keys()
+
+    def in_degree(self):
+        """Return the number of vertices leading into this one."""
+        return len(self.predecessors)
+
     def get_id(self):
         """Return the id of this vertex."""
         # Return the id of the vertex
@@ -198,76 +393,305 @@ class Graph:
         """Return all the vertices in the graph."""
         return set(self.vert_list.values())
 
-    def make_graph_from_file(self, file_name):
-        """Read graph data from a file, and create a graph based on it."""
-        valid_types = "gGdD"
-
-        graph_type = ""
-        vertices = ""
-        edge_list = []
-        directed = False
-        weighted = False
-        got_type = False
-
-        with open(file_name, 'r') as f:
-            for line in f.readlines():
-                # Strip trailing whitespace
-                line = line.rstrip()
-
-                # Skip line if it is empty to prevent index range errors below
-                if line == "":
-                    # Moves to next line (next iteration of for loop)
+    def make_graph_from_file(self, file_name, batch_size=65536):
+        """Read graph data from a file, and create a graph based on it.
+
+        The file is parsed as a stream by read_edge_list, so it may be
+        gzipped, use string vertex ids and decimal weights, and be larger
+        than memory. Edges are added in batches of batch_size.
+        """
+        # Set the graph type if it has not been set yet
+        set_type = self.num_vertices == 0
+
+        for kind, data in read_edge_list(file_name, batch_size=batch_size):
+            # See if graph is a digraph
+            if kind == "type":
+                if set_type:
+                    self.directed = data == "D"
+                    self.weighted = False
+
+            # Add vertices to graph
+            elif kind == "vertices":
+                for vertex in data:
+                    if vertex not in self.vert_list:
+                        self.add_vertex(vertex)
+
+            # Add edges to graph
+            else:
+                # The graph is weighted if any edge has a weight
+                if set_type and not self.weighted:
+                    self.weighted = any(edge[2] is not None for edge in data)
+                self.add_edges(data)
+
+    def add_edges(self, edges, duplicates="error"):
+        """Add many edges in one batch.
+
+        edges is an iterable of (from_key, to_key) or (from_key, to_key,
+        weight) tuples, where a weight of None means 1. Vertices are added
+        as needed, and the graph becomes weighted (without a warning) if
+        any weight is not 1. An edge given more than once, or already in
+        the graph, is handled by `duplicates`:
+            "error": raise KeyError before anything is added
+            "sum": add up the weights
+            "last": keep the last weight
+        """
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}")
+
+        # Gather the one-way edges to store, both ways if undirected
+        if not self.directed:
+            edges = both_ways(edges)
+        arcs = {}
+        for edge in edges:
+            arc = (edge[0], edge[1])
+            weight = edge[2] if len(edge) > 2 else None
+            if weight is None:
+                weight = 1
+            if arc not in arcs:
+                arcs[arc] = weight
+            elif duplicates == "error":
+                raise KeyError(f"{arc[1]} is already a neighbor of {arc[0]}")
+            elif duplicates == "sum":
+                arcs[arc] += weight
+            else:
+                arcs[arc] = weight
+
+        self.add_arcs(arcs, duplicates)
+
+    def add_edge_arrays(self, sources, targets, weights=None, keys=None,
+                        duplicates="error"):
+        """Add the edges sources[i] -> targets[i] with weights[i].
+
+        The sequences may be lists, arrays or memoryviews. If keys is given,
+        sources and targets hold indices into it instead of vertex keys.
+        See add_edges for `duplicates`.
+        """
+        if len(sources) != len(targets) or (weights is not None
+                                            and len(weights) != len(sources)):
+            raise ValueError("edge arrays must have the same length")
+        # Convert arrays to lists of Python numbers in one call
+        if hasattr(sources, "tolist"):
+            sources = sources.tolist()
+        if hasattr(targets, "tolist"):
+            targets = targets.tolist()
+        if hasattr(weights, "tolist"):
+            weights = weights.tolist()
+        if keys is not None:
+            sources = [keys[ind] for ind in sources]
+            targets = [keys[ind] for ind in targets]
+
+        if weights is None:
+            self.add_edges(zip(sources, targets), duplicates)
+        else:
+            self.add_edges(zip(sources, targets, weights), duplicates)
+
+    @classmethod
+    def from_edge_arrays(cls, sources, targets, weights=None, keys=None,
+                         directed=True, weighted=None, duplicates="error"):
+        """Return a new graph of the edges in sources, targets and weights.
+
+        The vertices of keys come first, in order, including any without
+        edges. The graph is weighted if weights are given, unless weighted
+        says otherwise. See add_edge_arrays.
+        """
+        if weighted is None:
+            weighted = weights is not None
+        graph = cls(weighted=weighted, directed=directed)
+        if keys is not None:
+            for key in keys:
+                graph.add_vertex(key)
+        graph.add_edge_arrays(sources, targets, weights, keys, duplicates)
+        return graph
+
+    @classmethod
+    def from_rows(cls, keys, rows, directed=True, weighted=True):
+        """Return a new graph of vertices keys, where rows[i] is the
+        {j: weight} of the edges leaving vertex keys[i].
+
+        The rows hold every one-way edge, so both directions of an
+        undirected edge. Nothing is checked or copied, which makes this
+        the fastest way to build a graph counted in index form.
+        """
+        graph = cls(weighted=weighted, directed=directed)
+        vertices = [graph.add_vertex(key) for key in keys]
+        for from_vert, row in zip(vertices, rows):
+            neighbors = from_vert.neighbors
+            for to_ind, weight in row.items():
+                to_vert = vertices[to_ind]
+                neighbors[to_vert] = weight
+                to_vert.predecessors[from_vert] = weight
+        return graph
+
+    def add_arcs(self, arcs, duplicates):
+        """Store {(from_key, to_key): weight} one-way edges.
+
+        With the "error" policy, every edge is checked against the graph
+        before any is stored.
+        """
+        vert_list = self.vert_list
+        if duplicates == "error":
+            for from_key, to_key in arcs:
+                from_vert = vert_list.get(from_key)
+                # Vertices without neighbors yet, as in a new graph, need
+                # no further check
+                if from_vert is None or not from_vert.neighbors:
                     continue
+                to_vert = vert_list.get(to_key)
+                if to_vert is not None and to_vert in from_vert.neighbors:
+                    raise KeyError(f"{to_key} is already a neighbor of "
+                                   f"{from_key}")
+
+        weighted = self.weighted
+        for (from_key, to_key), weight in arcs.items():
+            from_vert = vert_list.get(from_key)
+            if from_vert is None:
+                from_vert = self.add_vertex(from_key)
+            to_vert = vert_list.get(to_key)
+            if to_vert is None:
+                to_vert = self.add_vertex(to_key)
+            if duplicates == "sum":
+                weight += from_vert.neighbors.get(to_vert, 0)
+            if weight != 1:
+                weighted = True
+            from_vert.neighbors[to_vert] = weight
+            to_vert.predecessors[from_vert] = weight
+        self.weighted = weighted
 
-                # Find graph type
-                if line[0] in string.ascii_letters and not got_type:
-                    if line[0] in valid_types:
-                        graph_type = line[0].upper()
-                        got_type = True
-                    else:
-                        raise ValueError("Looking for type 'G' or 'D'")
-
-                # Find list of vertices
-                if line[0] in string.digits:
-                    vertices = line
-
-                # Find edges
-                if line[0] == "(":
-                    edge_list.append(line)
-
-        # See if graph is a digraph
-        if graph_type == "D":
-            directed = True
-        # See if graph is weighted
-        if len(edge_list[0].split(",")) == 3:
-            weighted = True
+    def save_binary_file(self, file_name):
+        """Write this graph to a compact binary file.
 
+        The file has a header, a table of vertex ids, and three arrays with
+        the source index, target index and weight of every stored edge.
+        """
+        # Intern the vertex ids to indices
+        vertices = list(self.vert_list.values())
+        index = {vertex: ind for ind, vertex in enumerate(vertices)}
+        keys = [vertex.id for vertex in vertices]
+
+        # Store string ids as UTF-8 separated by NUL, and int ids as int64
+        if all(isinstance(key, str) for key in keys):
+            if any("\0" in key for key in keys):
+                raise ValueError("binary files can't store vertex ids "
+                                 "containing NUL")
+            id_type = b"s"
+            id_table = "\0".join(keys).encode()
+        elif all(isinstance(key, int) for key in keys):
+            id_type = b"q"
+            id_table = array("q", keys).tobytes()
+        else:
+            raise TypeError("binary files need all str or all int vertex ids")
+
+        # Every stored neighbor entry is written, so undirected graphs keep
+        # both directions of each edge
+        sources = array("i")
+        targets = array("i")
+        weights = []
+        for from_ind, from_vert in enumerate(vertices):
+            for to_vert, weight in from_vert.neighbors.items():
+                sources.append(from_ind)
+                targets.append(index[to_vert])
+                weights.append(weight)
+        if all(isinstance(weight, int) for weight in weights):
+            weight_type = b"q"
+        else:
+            weight_type = b"d"
+        weights = array(weight_type.decode(), weights)
+
+        header = GRAPH_HEADER.pack(GRAPH_MAGIC, self.directed, self.weighted,
+                                   id_type, weight_type, len(vertices),
+                                   len(id_table), len(sources))
+        with open(file_name, "wb") as f:
+            f.write(header)
+            f.write(sources.tobytes())
+            f.write(targets.tobytes())
+            f.write(weights.tobytes())
+            f.write(id_table)
+
+    def make_graph_from_binary_file(self, file_name):
+        """Read a graph written by save_binary_file into this graph."""
+        with open(file_name, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with buffer, memoryview(buffer) as view:
+            # Check that this is a graph file of the expected size
+            if len(buffer) < GRAPH_HEADER.size:
+                raise ValueError(f"{file_name} is not a binary graph file")
+            (magic, directed, weighted, id_type, weight_type, num_vertices,
+             id_table_size, num_edges) = GRAPH_HEADER.unpack_from(buffer)
+            id_type = id_type.decode()
+            weight_type = weight_type.decode()
+            sizes = [("i", num_edges), ("i", num_edges),
+                     (weight_type, num_edges), ("B", id_table_size)]
+            expected = GRAPH_HEADER.size + sum(
+                array(code).itemsize * length for code, length in sizes)
+            if magic != GRAPH_MAGIC or len(buffer) != expected:
+                raise ValueError(f"{file_name} is not a binary graph file")
+
+            # Slice the arrays out of the mapped file without copying
+            tables = []
+            offset = GRAPH_HEADER.size
+            for code, length in sizes:
+                end = offset + array(code).itemsize * length
+                tables.append(view[offset:end].cast(code))
+                offset = end
+            sources, targets, weights, id_table = tables
+
+            try:
+                # Decode the vertex table
+                if num_vertices == 0:
+                    keys = []
+                elif id_type == "s":
+                    keys = bytes(id_table).decode().split("\0")
+                else:
+                    keys = id_table.cast(id_type).tolist()
+                if len(keys) != num_vertices or len(set(keys)) != len(keys):
+                    raise ValueError(f"{file_name} has a corrupt vertex table")
+                for table in (sources, targets):
+                    if num_edges and not (0 <= min(table)
+                                          and max(table) < num_vertices):
+                        raise ValueError(f"{file_name} has an edge to a "
+                                         f"vertex out of range")
+
+                self.bulk_load(keys, sources, targets, weights, directed,
+                               weighted)
+            finally:
+                # Release the slices so the mapping can be closed
+                for table in tables:
+                    table.release()
+
+    def bulk_load(self, keys, sources, targets, weights, directed, weighted):
+        """Add vertices `keys` and the edges given as index arrays."""
         # Set the graph type if it has not been set yet
         if self.num_vertices == 0:
-            self.weighted = weighted
-            self.directed = directed
-
-        # Add vertices to graph
-        # TODO: Does not handle string vertex names
-        if vertices != "":
-            for vertex in vertices.split(","):
-                self.add_vertex(vertex)
-
-        # Add edges to graph
-        # TODO: Does not handle string vertex names or decimal weights
-        for edge in edge_list:
-            # Remove parenthesis
-            data = edge[1:-1]
-            # Turn data into array by splitting on commas
-            data = data.split(",")
-
-            # Split the tuple correctly
-            if weighted:
-                # Remove parenthesis from strings, and convert strings to ints
-                self.add_edge(data[0], data[1], int(data[2]))
-            else:
-                # Remove parenthesis from strings, and convert strings to ints
-                self.add_edge(data[0], data[1])
+            self.directed = bool(directed)
+            self.weighted = bool(weighted)
+
+        # Create the vertices, reusing any that are already in the graph
+        vert_list = self.vert_list
+        had_edges = any(vertex.neighbors for vertex in vert_list.values())
+        vertices = []
+        for key in keys:
+            vertex = vert_list.get(key)
+            if vertex is None:
+                vertex = self.add_vertex(key)
+            vertices.append(vertex)
+
+        # The file stores every one-way edge, both ways if undirected
+        sources = sources.tolist() if hasattr(sources, "tolist") else sources
+        targets = targets.tolist() if hasattr(targets, "tolist") else targets
+        weights = weights.tolist() if hasattr(weights, "tolist") else weights
+        if had_edges:
+            # Check every edge before any is stored
+            for from_ind, to_ind in zip(sources, targets):
+                if vertices[to_ind] in vertices[from_ind].neighbors:
+                    raise KeyError(f"{keys[to_ind]} is already a neighbor of "
+                                   f"{keys[from_ind]}")
+        for from_ind, to_ind, weight in zip(sources, targets, weights):
+            from_vert = vertices[from_ind]
+            to_vert = vertices[to_ind]
+            from_vert.neighbors[to_vert] = weight
+            to_vert.predecessors[from_vert] = weight
+        if not self.weighted and any(weight != 1 for weight in weights):
+            self.weighted = True
 
     def get_edge_list(self):
         """Return a list of edges (with their weights if weighted)."""
@@ -304,7 +728,7 @@ class Graph:
             raise TypeError("vertex parameter must be of type Vertex")
 
         # Raise error if vertex not in the graph
-        if vertex not in self.get_vertices():
+        if vertex.id not in self.vert_list:
             raise ValueError(f"{vertex} is not in the Graph")
 
         # If the search is looking for vertices only accessible at level n,
@@ -328,7 +752,7 @@ class Graph:
             # Queue vertices if they will be seen for the first time
             if only_new:
                 # Go through the neighbors of the popped_vertex
-                for vert in popped_vertex.get_neighbors():
+                for vert in popped_vertex.neighbor_view():
                     # If this vertex is new, allow it to be traversed
                     if vert not in seen_vertices:
                         # Set the parent of this vertex as the popped vertex
@@ -340,7 +764,7 @@ class Graph:
             # Otherwise, just add all vertices
             else:
                 # Add all vertices that vert can reach to the back of the deque
-                vertex_deque.extend(popped_vertex.get_neighbors())
+                vertex_deque.extend(popped_vertex.neighbor_view())
             # Remove one from the counter because a vertex was just popped
             counter -= 1
 
@@ -358,8 +782,110 @@ class Graph:
         # Return a set of all the vertices that can be reached at the nth level
         return set(vertex_deque)
 
-    def find_shortest_path(self, start, end):
-        """Find the shortest path between two vertices."""
+    def shortest_path_tree(self, vertex, target=None):
+        """Find the shortest paths from vertex with one breadth first search.
+
+        Return two dicts over the vertices that can be reached: the number
+        of edges on a shortest path to each of them, and the vertex before
+        it on that path (None for vertex itself). The search stops as soon
+        as target is reached. Nothing is stored on the vertices.
+        """
+        # Raise error if non vertex object is passed in as vertex
+        if not isinstance(vertex, Vertex):
+            raise TypeError("vertex parameter must be of type Vertex")
+        # Raise error if vertex not in the graph
+        if vertex.id not in self.vert_list:
+            raise ValueError(f"{vertex} is not in the Graph")
+
+        distances = {vertex: 0}
+        predecessors = {vertex: None}
+        frontier = [vertex]
+        level = 0
+        while frontier:
+            level += 1
+            next_frontier = []
+            for from_vert in frontier:
+                for to_vert in from_vert.neighbor_view():
+                    if to_vert not in distances:
+                        distances[to_vert] = level
+                        predecessors[to_vert] = from_vert
+                        if to_vert == target:
+                            return distances, predecessors
+                        next_frontier.append(to_vert)
+            frontier = next_frontier
+        return distances, predecessors
+
+    def bidirectional_search(self, start_vert, end_vert):
+        """Return a shortest path from start_vert to end_vert, or None.
+
+        Breadth first searches grow from both ends, along edges from the
+        start and against them (through predecessor_view) from the end,
+        always extending the side with the smaller frontier, until they
+        meet. On large graphs this visits far fewer vertices than a search
+        from one end.
+        """
+        if start_vert == end_vert:
+            return [start_vert]
+        # For each side: {vertex: (vertex before it, distance)}
+        forward = {start_vert: (None, 0)}
+        backward = {end_vert: (None, 0)}
+        forward_frontier = [start_vert]
+        backward_frontier = [end_vert]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, seen, other = forward_frontier, forward, backward
+                reverse = False
+            else:
+                frontier, seen, other = backward_frontier, backward, forward
+                reverse = True
+
+            # Grow this side by a whole level, keeping the best meeting
+            # vertex found on it
+            next_frontier = []
+            best = None
+            for from_vert in frontier:
+                level = seen[from_vert][1] + 1
+                if reverse:
+                    view = from_vert.predecessor_view()
+                else:
+                    view = from_vert.neighbor_view()
+                for to_vert in view:
+                    if to_vert in seen:
+                        continue
+                    seen[to_vert] = (from_vert, level)
+                    next_frontier.append(to_vert)
+                    if to_vert in other:
+                        length = level + other[to_vert][1]
+                        if best is None or length < best[0]:
+                            best = (length, to_vert)
+
+            if best is not None:
+                # Walk back to both ends from where the searches met
+                path = []
+                vert = best[1]
+                while vert is not None:
+                    path.append(vert)
+                    vert = forward[vert][0]
+                path.reverse()
+                vert = backward[best[1]][0]
+                while vert is not None:
+                    path.append(vert)
+                    vert = backward[vert][0]
+                return path
+
+            if reverse:
+                backward_frontier = next_frontier
+            else:
+                forward_frontier = next_frontier
+        return None
+
+    def find_shortest_path(self, start, end, bidirectional=False):
+        """Find the shortest path between two vertices.
+
+        There is no path from a vertex to itself. With bidirectional, the
+        path is searched for from both ends at once.
+        """
         # Raise error if start or end does not exist in graph
         if start not in self.vert_list:
             raise KeyError(f"Vertex({start}) is not in the Graph")
@@ -369,31 +895,25 @@ class Graph:
         # Set the starting and ending vertices, using start and end keys
         start_vert = self.vert_list[start]
         end_vert = self.vert_list[end]
+        if start_vert == end_vert:
+            return None
 
-        # Get the vertices one edge away from starting vertex
-        level = 1
-        verts_at_n_level = self.breadth_first_search(start_vert, level)
-        # Keep searching levels there is nothing, or the end vertex is found
-        while end_vert not in verts_at_n_level:
-            # If there are no more vertices to search
-            if len(verts_at_n_level) == 0:
-                # Return None because there is no path between the vertices
-                return None
-            # Get the vertices one more edge away from the starting vertex
-            level += 1
-            verts_at_n_level = self.breadth_first_search(start_vert, level)
+        if bidirectional:
+            return self.bidirectional_search(start_vert, end_vert)
 
-        # Create a path list and the ending vertex
+        # Search until the end vertex is found
+        _, predecessors = self.shortest_path_tree(start_vert, end_vert)
+        if end_vert not in predecessors:
+            # Return None because there is no path between the vertices
+            return None
+
+        # Go through the predecessors, until start vertex is reached
         path = [end_vert]
-        parent = end_vert
-        # Go through the parents of each vertex, until start vertex is reached
-        while start_vert != parent:
-            # Move to the parent of the current vertex, and add it to the path
-            parent = parent.parent
-            path.append(parent)
+        while path[-1] != start_vert:
+            path.append(predecessors[path[-1]])
 
         # Reverse the path, and return it
-        path[:] = reversed(path)
+        path.reverse()
         return path
 
     def depth_first_search(self, vertex, least_first=True, clear_parents=True):
@@ -488,7 +1008,7 @@ class Graph:
             vertex = random.choice(list(self.get_vertices()))
 
         # Raise error if vertex not in the graph
-        if vertex not in self.get_vertices():
+        if vertex.id not in self.vert_list:
             raise ValueError(f"Vertex({vertex}) is not in the Graph")
 
         # Initialize clique as a set of vertices
@@ -497,10 +1017,10 @@ class Graph:
         # If order matters, sort the neighbors
         if least_first:
             # Sort the neighbors
-            neighbors = sorted(vertex.get_neighbors())
+            neighbors = sorted(vertex.neighbor_view())
         else:
-            # Otherwise, just get the unordered set
-            neighbors = vertex.get_neighbors()
+            # Otherwise, just view the unordered neighbors
+            neighbors = vertex.neighbor_view()
 
         # Clique members must be neighbor of vertex parameter
         for neighbor in neighbors:
@@ -509,7 +1029,7 @@ class Graph:
             # Check each clique member if it is adjacent to current neighbor
             for clique_member in clique:
                 # If the current neighbor is not adjacent to this clique member
-                if neighbor not in clique_member.get_neighbors():
+                if neighbor not in clique_member.neighbor_view():
                     # Break out of this loop, and move to next neighbor
                     break
                 # If it is, increase the count of adjacent clique members
@@ -602,84 +1122,37 @@ class Graph:
         # Check all vertices in self for their degree
         for vertex in self:
             # If a vertex has an odd degree, the graph is not Eulerian
-            if len(vertex.get_neighbors()) % 2 == 1:
+            if vertex.out_degree() % 2 == 1:
                 return False
 
         # If all vertices have an even degree, the graph is Eulerian
         return True
 
     def reverse_directions(self):
-        """Return dictionary of vertices and vertices that lead into them."""
-        reverse_dict = {}
+        """Return dictionary of vertices and vertices that lead into them.
 
-        for from_vert in self:
-            for to_vert in from_vert.get_neighbors():
-                if to_vert in reverse_dict:
-                    reverse_dict[to_vert].add(from_vert)
-                else:
-                    reverse_dict[to_vert] = set([from_vert])
-
-        return reverse_dict
+        Every vertex is a key, with an empty set if nothing leads into it.
+        """
+        return {vertex: set(vertex.predecessor_view()) for vertex in self}
 
     def diameter(self):
-        """Return the diameter of the graph."""
-        # Set bounds of diameter
-        left = 0
-        right = self.num_vertices
-
-        # While the bound range is still big
-        while right - left > 1:
-            # Calculate the average level to check
-            level = (left + right) // 2
-            # This variable tracks if vertices were found at a given level
-            something_at_level = False
-            # Do a breadth first search for each vertex in the graph
-            for vert in self:
-                at_level = self.breadth_first_search(vert, level)
-                # If there are vertices at this level,
-                if len(at_level) > 0:
-                    # Mark that there is something at the level
-                    something_at_level = True
-                    # If vertices were found, nothing more needs to be checked
-                    break
-            # If there are vertices at this level,
-            if something_at_level:
-                # Raise the left, or lower, bound
-                left = level
-            # If there is nothing,
-            else:
-                # Lower the right, or upper, bound
-                right = level
-
-        # Find the true diameter using the bounds
-        something_at_level = True
-        # Start at the left bound
-        diameter = left
-        # Initialize variables for start and end of a path with length diameter
+        """Return the diameter of the graph.
+
+        That is the most edges on any shortest path, with the last vertex
+        (in the order of the graph) to start such a path and a vertex it
+        ends at.
+        """
+        diameter = 0
         start = None
         end = None
-        # While there exists a shortest path at a level
-        while something_at_level:
-            # Do a breadth first search for each vertex in the graph
-            for vert in self:
-                # Get the vertices that are "diameter" edges away
-                at_level = self.breadth_first_search(vert, diameter)
-                # If there are vertices at this level,
-                if len(at_level) > 0:
-                    # Capture one of possibly many starting and ending vertices
-                    # with a shortest path length of the diameter size
-                    start = vert
-                    end = at_level.pop()
-                # If there is nothing at this level
-                else:
-                    # Break the loop
-                    something_at_level = False
-            # Check if there is any path length at the next diameter size
-            diameter += 1
-
-        # Since there was nothing at the last level, subtract 1 from diameter
-        diameter -= 1
-        # Return diameter and vertices with a path length of that diameter
+        # Find the farthest vertex from each vertex with one search
+        for vert in self:
+            distances, _ = self.shortest_path_tree(vert)
+            farthest = max(distances, key=distances.get)
+            if distances[farthest] >= diameter and distances[farthest] > 0:
+                diameter = distances[farthest]
+                start = vert
+                end = farthest
         return (diameter, start, end)
 
     def influencer(self, iterations=30):
@@ -687,9 +1160,6 @@ class Graph:
         # All vertices start with the same rank: 1 / number of vertices
         ranks = {vertex: 1 / self.num_vertices for vertex in self}
 
-        # Get all vertices and vertices that lead into those vertices
-        reverse_dict = self.reverse_directions()
-
         # Calculate the rank "iterations" number of times
         for _ in range(iterations):
             new_ranks = {}
@@ -700,12 +1170,12 @@ class Graph:
 
                 # Each rank for a given vertex depends on the vertices
                 # directing into it
-                for from_vert in reverse_dict[vertex]:
+                for from_vert in vertex.predecessor_view():
                     # Portion of rank provided by from_vert is:
                     # from_vert's previous rank
                     # ------- divided by -------
                     # number of vertices from_vert directs into
-                    portion = ranks[from_vert] / len(from_vert.get_neighbors())
+                    portion = ranks[from_vert] / from_vert.out_degree()
                     # Each from_vert leading into this vertex contributes to
                     # this vertex's rank
                     new_rank += portion
@@ -725,33 +1195,14 @@ class Graph:
 
     def average_path(self):
         """Return the average path of the graph."""
-        # Keeping track of all paths
-        paths = {}
-
-        # Calculate all the shortest paths
+        # Add up the shortest paths from every vertex to every other one,
+        # leaving out paths from a vertex to itself
+        total_path_length = 0
         for from_vert in self:
-            # Reset variables for each from_vert
-            something_at_level = True
-            # Don't count path from vertex to itself
-            level = 1
-            # Do a breadth first search for each vertex in the graph
-            while something_at_level:
-                at_level = self.breadth_first_search(from_vert, level)
-                # If there are vertices at this level,
-                if len(at_level) > 0:
-                    # Set the shortest path from from_vert to to_vert
-                    for to_vert in at_level:
-                        # Set path for all edges
-                        edge = (from_vert.id, to_vert.id)
-                        paths[edge] = level
-                    # Move on to the next level
-                    level += 1
-                # Otherwise, break the loop by marking that nothing was found
-                else:
-                    something_at_level = False
+            distances, _ = self.shortest_path_tree(from_vert)
+            total_path_length += sum(distances.values())
 
         # Calculate the average path length
-        total_path_length = sum(paths.values())
         total_edges = (self.num_vertices * (self.num_vertices - 1))
         average_path = total_path_length / total_edges
         return average_path
@@ -824,3 +1275,571 @@ class Graph:
 
         # Return the walked vertices, in order
         return walk
+
+
+class CSRVertex(Vertex):
+    """Vertex of a CSRGraph.
+
+    The vertex holds no edges itself: its neighbors are read from the
+    graph's arrays each time they are asked for.
+    """
+
+    __slots__ = ("graph", "index")
+
+    def __init__(self, graph, index):
+        """Initialize the view of vertex number `index` of graph."""
+        self.graph = graph
+        self.index = index
+        self.id = graph.ids[index]
+        self.parent = None
+
+    @property
+    def neighbors(self):
+        """Return a read-only mapping of the neighbors of this vertex and
+        their edge weights. Edges are added through the graph."""
+        graph = self.graph
+        start, end = graph.row(self.index)
+        views = graph.views
+        return MappingProxyType({views[graph.targets[ind]]: graph.weights[ind]
+                                 for ind in range(start, end)})
+
+    @property
+    def predecessors(self):
+        """Return a read-only mapping of the vertices leading into this one
+        and their weights."""
+        graph = self.graph
+        start, end = graph.in_row(self.index)
+        views = graph.views
+        return MappingProxyType({views[graph.sources[ind]]:
+                                 graph.in_weights[ind]
+                                 for ind in range(start, end)})
+
+    def add_neighbor(self, vertex, weight=1):
+        """Add a neighbor along a weighted edge."""
+        self.graph.add_arc(self.index, self.graph.id_index[vertex.id], weight)
+
+    def get_neighbors(self):
+        """Return the neighbors of this vertex."""
+        graph = self.graph
+        start, end = graph.row(self.index)
+        views = graph.views
+        return {views[to_ind] for to_ind in graph.targets[start:end]}
+
+    def neighbor_view(self):
+        """Return a read-only view of the neighbors of this vertex."""
+        return CSRNeighborView(self.graph, self.index)
+
+    def out_degree(self):
+        """Return the number of neighbors of this vertex."""
+        start, end = self.graph.row(self.index)
+        return end - start
+
+    def predecessor_view(self):
+        """Return a read-only view of the vertices leading into this one."""
+        return CSRNeighborView(self.graph, self.index, reverse=True)
+
+    def in_degree(self):
+        """Return the number of vertices leading into this one."""
+        start, end = self.graph.in_row(self.index)
+        return end - start
+
+    def get_edge_weight(self, vertex):
+        """Return the weight of this edge."""
+        graph = self.graph
+        to_ind = graph.id_index.get(vertex.id)
+        # Edges not merged yet are answered from pending
+        if (self.index, to_ind) in graph.pending:
+            return graph.pending[(self.index, to_ind)]
+        ind = -1 if to_ind is None else graph.find_arc(self.index, to_ind,
+                                                       merge=False)
+        if ind < 0:
+            raise KeyError(vertex)
+        return graph.weights[ind]
+
+
+class CSRNeighborView(Set):
+    """Read-only set of the neighbors of a CSRGraph vertex, or of the
+    vertices leading into it if reverse, looked up in the graph's arrays."""
+
+    __slots__ = ("graph", "index", "reverse")
+
+    def __init__(self, graph, index, reverse=False):
+        self.graph = graph
+        self.index = index
+        self.reverse = reverse
+
+    def __contains__(self, vertex):
+        if not isinstance(vertex, Vertex):
+            return False
+        other = self.graph.id_index.get(vertex.id)
+        if other is None:
+            return False
+        arc = (other, self.index) if self.reverse else (self.index, other)
+        return (arc in self.graph.pending
+                or self.graph.find_arc(*arc, merge=False) >= 0)
+
+    def __iter__(self):
+        graph = self.graph
+        if self.reverse:
+            start, end = graph.in_row(self.index)
+            indices = graph.sources[start:end]
+        else:
+            start, end = graph.row(self.index)
+            indices = graph.targets[start:end]
+        views = graph.views
+        return (views[ind] for ind in indices)
+
+    def __len__(self):
+        if self.reverse:
+            start, end = self.graph.in_row(self.index)
+        else:
+            start, end = self.graph.row(self.index)
+        return end - start
+
+
+class CSRGraph(Graph):
+    """Graph with the same interface, storing its edges in flat arrays.
+
+    Vertex ids are interned to indices 0..n-1. The neighbors of vertex i
+    are targets[offsets[i]:offsets[i + 1]], sorted by index, with the edge
+    weights at the same positions of weights (int64 until a decimal weight
+    is added, then float64). An edge takes 12 bytes instead of a dict entry
+    and its key, and traversals run over the arrays.
+
+    Added edges are kept in `pending` and merged into the arrays the next
+    time the rows are read, so building a graph costs one merge. Edge
+    weights and membership are answered from pending without a merge.
+    """
+
+    def __init__(self, weighted=False, directed=True):
+        """Initialize an empty graph."""
+        super().__init__(weighted, directed)
+        self.ids = []
+        self.id_index = {}
+        self.views = []
+        self.offsets = array("q", [0])
+        self.targets = array("i")
+        self.weights = array("q")
+        # {(from index, to index): weight} of edges not merged yet
+        self.pending = {}
+        # The same edges by target: the vertices leading into vertex i are
+        # sources[in_offsets[i]:in_offsets[i + 1]]. Built when first needed
+        # after a merge
+        self.in_offsets = None
+        self.sources = None
+        self.in_weights = None
+
+    def add_vertex(self, key):
+        """Add a new vertex object to the graph with the given key.
+
+        Return the vertex if the vertex is new, else raise KeyError.
+        """
+        if key in self.id_index:
+            raise KeyError(f"Vertex({key}) is already in the Graph")
+        self.num_vertices += 1
+        self.id_index[key] = len(self.ids)
+        self.ids.append(key)
+        new_vertex = CSRVertex(self, len(self.views))
+        self.views.append(new_vertex)
+        self.vert_list[key] = new_vertex
+        return new_vertex
+
+    def intern(self, key):
+        """Return the index of vertex `key`, adding the vertex if needed."""
+        ind = self.id_index.get(key)
+        if ind is None:
+            ind = self.add_vertex(key).index
+        return ind
+
+    def add_edge(self, from_key, to_key, weight=1):
+        """Add edge from vertex with key `from_key` to vertex with key `to_key`.
+
+        If a weight is provided, use that weight.
+        """
+        if weight != 1 and not self.weighted:
+            print(f"Detected weight of {weight} in unweighted graph.")
+            print("Graph is now weighted, all previous vertices have weight 1")
+            self.weighted = True
+
+        from_ind = self.intern(from_key)
+        to_ind = self.intern(to_key)
+        self.add_arc(from_ind, to_ind, weight)
+        if not self.directed:
+            self.add_arc(to_ind, from_ind, weight)
+
+    def add_arcs(self, arcs, duplicates):
+        """Store {(from_key, to_key): weight} one-way edges."""
+        id_index = self.id_index
+        if duplicates == "error":
+            for from_key, to_key in arcs:
+                from_ind = id_index.get(from_key)
+                to_ind = id_index.get(to_key)
+                if from_ind is not None and to_ind is not None and (
+                        (from_ind, to_ind) in self.pending
+                        or self.find_arc(from_ind, to_ind, merge=False) >= 0):
+                    raise KeyError(f"{to_key} is already a neighbor of "
+                                   f"{from_key}")
+
+        weighted = self.weighted
+        pending = self.pending
+        for (from_key, to_key), weight in arcs.items():
+            if not isinstance(weight, numbers.Real):
+                raise TypeError(f"edge weight must be a number, not "
+                                f"{weight!r}")
+            if weight != 1:
+                weighted = True
+            arc = (self.intern(from_key), self.intern(to_key))
+            if duplicates == "error" or arc in pending:
+                if duplicates == "sum":
+                    weight += pending[arc]
+                pending[arc] = weight
+                continue
+            # Update an edge already in the arrays in place
+            ind = self.find_arc(arc[0], arc[1], merge=False)
+            if ind < 0:
+                pending[arc] = weight
+                continue
+            if duplicates == "sum":
+                weight += self.weights[ind]
+            if self.weights.typecode == "q" and not isinstance(weight, int):
+                self.use_float_weights()
+            self.weights[ind] = weight
+            if self.in_offsets is not None:
+                start = self.in_offsets[arc[1]]
+                end = self.in_offsets[arc[1] + 1]
+                self.in_weights[bisect_left(self.sources, arc[0], start,
+                                            end)] = weight
+        self.weighted = weighted
+
+    def use_float_weights(self):
+        """Switch the weight arrays from int64 to float64."""
+        self.weights = array("d", self.weights)
+        if self.in_offsets is not None:
+            self.in_weights = array("d", self.in_weights)
+
+    def bulk_load(self, keys, sources, targets, weights, directed, weighted):
+        """Add vertices `keys` and the edges given as index arrays.
+
+        An empty graph adopts edges already sorted by source, then target,
+        as save_binary_file writes them, as its arrays. Other edges are
+        checked against the graph and merged.
+        """
+        if self.num_vertices == 0:
+            self.directed = bool(directed)
+            self.weighted = bool(weighted)
+        had_edges = bool(self.pending or self.targets)
+        adopt = self.num_vertices == 0
+        indices = [self.intern(key) for key in keys]
+        sources = sources.tolist() if hasattr(sources, "tolist") else sources
+        targets = targets.tolist() if hasattr(targets, "tolist") else targets
+        weights = weights.tolist() if hasattr(weights, "tolist") else weights
+
+        if adopt:
+            # Sort the edges by source, then target, unless they already are
+            num_vertices = len(indices)
+            codes = [from_ind * num_vertices + to_ind
+                     for from_ind, to_ind in zip(sources, targets)]
+            if not all(map(lt, codes, islice(codes, 1, None))):
+                order = sorted(range(len(codes)), key=codes.__getitem__)
+                codes = [codes[ind] for ind in order]
+                sources = [sources[ind] for ind in order]
+                targets = [targets[ind] for ind in order]
+                weights = [weights[ind] for ind in order]
+                # Repeated edges are left to the merge
+                adopt = all(map(lt, codes, islice(codes, 1, None)))
+        if adopt:
+            offsets = self.offsets
+            for from_ind in range(1, num_vertices + 1):
+                offsets.append(bisect_left(sources, from_ind))
+            self.targets = array("i", targets)
+            if not all(isinstance(weight, int) for weight in weights):
+                self.weights = array("d")
+            self.weights.extend(weights)
+        else:
+            arcs = list(zip(zip([indices[ind] for ind in sources],
+                                [indices[ind] for ind in targets]), weights))
+            if had_edges:
+                # Check every edge before any is stored
+                for arc, _ in arcs:
+                    if arc in self.pending or self.find_arc(
+                            arc[0], arc[1], merge=False) >= 0:
+                        raise KeyError(f"{self.ids[arc[1]]} is already a "
+                                       f"neighbor of {self.ids[arc[0]]}")
+            self.pending.update(arcs)
+        if not self.weighted and any(weight != 1 for weight in weights):
+            self.weighted = True
+
+    @classmethod
+    def from_rows(cls, keys, rows, directed=True, weighted=True):
+        """Return a new graph of vertices keys, where rows[i] is the
+        {j: weight} of the edges leaving vertex keys[i]. The rows become
+        the arrays directly."""
+        graph = cls(weighted=weighted, directed=directed)
+        for key in keys:
+            graph.add_vertex(key)
+        weights = []
+        for row in rows:
+            items = sorted(row.items())
+            graph.targets.extend(to_ind for to_ind, _ in items)
+            weights.extend(weight for _, weight in items)
+            graph.offsets.append(len(graph.targets))
+        if not all(isinstance(weight, int) for weight in weights):
+            graph.weights = array("d")
+        graph.weights.extend(weights)
+        return graph
+
+    def add_arc(self, from_ind, to_ind, weight):
+        """Add the one-way edge from_ind -> to_ind, raising KeyError if it
+        is already in the graph."""
+        if ((from_ind, to_ind) in self.pending
+                or self.find_arc(from_ind, to_ind, merge=False) >= 0):
+            raise KeyError(f"{self.ids[to_ind]} is already a neighbor of "
+                           f"{self.ids[from_ind]}")
+        if not isinstance(weight, numbers.Real):
+            raise TypeError(f"edge weight must be a number, not {weight!r}")
+        self.pending[(from_ind, to_ind)] = weight
+
+    def find_arc(self, from_ind, to_ind, merge=True):
+        """Return the array position of edge from_ind -> to_ind, or -1."""
+        if merge:
+            self.merge()
+        if from_ind + 1 >= len(self.offsets):
+            return -1
+        start = self.offsets[from_ind]
+        end = self.offsets[from_ind + 1]
+        ind = bisect_left(self.targets, to_ind, start, end)
+        if ind < end and self.targets[ind] == to_ind:
+            return ind
+        return -1
+
+    def row(self, ind):
+        """Return the (start, end) of the neighbors of vertex ind."""
+        self.merge()
+        return self.offsets[ind], self.offsets[ind + 1]
+
+    def in_row(self, ind):
+        """Return the (start, end) of the vertices leading into vertex ind
+        in sources and in_weights."""
+        self.merge()
+        if self.in_offsets is None:
+            self.index_sources()
+        return self.in_offsets[ind], self.in_offsets[ind + 1]
+
+    def index_sources(self):
+        """Build the in-edge arrays with a counting sort of the edges."""
+        offsets = self.offsets
+        targets = self.targets
+        weights = self.weights
+        num_vertices = len(offsets) - 1
+        counts = [0] * (num_vertices + 1)
+        for to_ind in targets:
+            counts[to_ind + 1] += 1
+        for ind in range(num_vertices):
+            counts[ind + 1] += counts[ind]
+        in_offsets = array("q", counts)
+
+        # Filling by increasing source keeps every row sorted
+        sources = array("i", bytes(4 * len(targets)))
+        in_weights = array(weights.typecode, bytes(8 * len(targets)))
+        fill = counts[:-1]
+        for from_ind in range(num_vertices):
+            for ind in range(offsets[from_ind], offsets[from_ind + 1]):
+                to_ind = targets[ind]
+                sources[fill[to_ind]] = from_ind
+                in_weights[fill[to_ind]] = weights[ind]
+                fill[to_ind] += 1
+
+        self.in_offsets = in_offsets
+        self.sources = sources
+        self.in_weights = in_weights
+
+    def merge(self):
+        """Merge the pending edges into the arrays.
+
+        Only the rows gaining edges are rebuilt, in the in-edge arrays too
+        if they have been built, so reads mixed with adds stay cheap.
+        """
+        # Vertices added since the last merge have no stored edges yet
+        num_vertices = len(self.ids)
+        for name in ("offsets", "in_offsets"):
+            offsets = getattr(self, name)
+            if offsets is not None and len(offsets) <= num_vertices:
+                offsets.extend(repeat(offsets[-1],
+                                      num_vertices + 1 - len(offsets)))
+        if not self.pending:
+            return
+        added = sorted((from_ind, to_ind, weight) for (from_ind, to_ind),
+                       weight in self.pending.items())
+        if self.weights.typecode == "q" and not all(
+                isinstance(weight, int) for _, _, weight in added):
+            self.use_float_weights()
+
+        self.offsets, self.targets, self.weights = insert_into_rows(
+            self.offsets, self.targets, self.weights, added)
+        if self.in_offsets is not None:
+            added.sort(key=lambda arc: (arc[1], arc[0]))
+            self.in_offsets, self.sources, self.in_weights = insert_into_rows(
+                self.in_offsets, self.sources, self.in_weights,
+                [(to_ind, from_ind, weight)
+                 for from_ind, to_ind, weight in added])
+        self.pending = {}
+
+    def resolve(self, vertex):
+        """Return the index of a vertex object, checking it is in the graph."""
+        if not isinstance(vertex, Vertex):
+            raise TypeError("vertex parameter must be of type Vertex")
+        ind = self.id_index.get(vertex.id)
+        if ind is None:
+            raise ValueError(f"{vertex} is not in the Graph")
+        return ind
+
+    def get_edge_list(self):
+        """Return a list of edges (with their weights if weighted)."""
+        self.merge()
+        ids = self.ids
+        offsets = self.offsets
+        targets = self.targets
+        weights = self.weights
+        edge_list = set()
+        for from_ind in range(len(ids)):
+            for ind in range(offsets[from_ind], offsets[from_ind + 1]):
+                to_ind = targets[ind]
+                # An undirected edge is stored both ways, keep one of them
+                if not self.directed and to_ind < from_ind:
+                    continue
+                if self.weighted:
+                    edge_list.add((ids[from_ind], ids[to_ind], weights[ind]))
+                else:
+                    edge_list.add((ids[from_ind], ids[to_ind]))
+        return edge_list
+
+    def breadth_first_search(self, vertex, n, only_new=True):
+        """Find all vertices n edges away from the passed in vertex."""
+        start = self.resolve(vertex)
+        self.merge()
+        offsets = self.offsets
+        targets = self.targets
+        views = self.views
+
+        frontier = [start]
+        if only_new:
+            seen = bytearray(len(views))
+            seen[start] = 1
+        for _ in range(n):
+            if not frontier:
+                break
+            # Walks that revisit vertices reach the same set of vertices,
+            # so each level only needs to hold every vertex once
+            next_frontier = [] if only_new else set()
+            for from_ind in frontier:
+                row = targets[offsets[from_ind]:offsets[from_ind + 1]]
+                if only_new:
+                    for to_ind in row:
+                        if not seen[to_ind]:
+                            seen[to_ind] = 1
+                            views[to_ind].parent = views[from_ind]
+                            next_frontier.append(to_ind)
+                else:
+                    next_frontier.update(row)
+            frontier = next_frontier
+        return {views[ind] for ind in frontier}
+
+    def search(self, start, target=-1):
+        """Breadth first search from vertex index start over the arrays.
+
+        Return two lists by vertex index: the number of edges from start,
+        or -1 if the vertex was not reached, and the index of the vertex
+        before it on a shortest path (-1 for start and unreached vertices).
+        The search stops once vertex index target is reached.
+        """
+        self.merge()
+        offsets = self.offsets
+        targets = self.targets
+        distance = [-1] * len(self.ids)
+        parent = [-1] * len(self.ids)
+        distance[start] = 0
+        frontier = [start]
+        level = 0
+        while frontier:
+            level += 1
+            next_frontier = []
+            for from_ind in frontier:
+                for to_ind in targets[offsets[from_ind]:offsets[from_ind + 1]]:
+                    if distance[to_ind] < 0:
+                        distance[to_ind] = level
+                        parent[to_ind] = from_ind
+                        if to_ind == target:
+                            return distance, parent
+                        next_frontier.append(to_ind)
+            frontier = next_frontier
+        return distance, parent
+
+    def shortest_path_tree(self, vertex, target=None):
+        """Find the shortest paths from vertex with one breadth first search.
+
+        See Graph.shortest_path_tree; the search itself runs on index lists.
+        """
+        start = self.resolve(vertex)
+        target_ind = -1
+        if target is not None:
+            target_ind = self.id_index.get(target.id, -1)
+        distance, parent = self.search(start, target_ind)
+        views = self.views
+        distances = {}
+        predecessors = {}
+        for ind, length in enumerate(distance):
+            if length >= 0:
+                distances[views[ind]] = length
+                predecessors[views[ind]] = (
+                    views[parent[ind]] if parent[ind] >= 0 else None)
+        return distances, predecessors
+
+    def diameter(self):
+        """Return the diameter of the graph, see Graph.diameter."""
+        self.merge()
+        diameter = 0
+        start = None
+        end = None
+        for from_ind in range(len(self.ids)):
+            distance = self.search(from_ind)[0]
+            longest = max(distance)
+            if longest >= diameter and longest > 0:
+                diameter = longest
+                start = self.views[from_ind]
+                end = self.views[distance.index(longest)]
+        return (diameter, start, end)
+
+    def influencer(self, iterations=30):
+        """Calculate the influence of each vertex."""
+        self.merge()
+        offsets = self.offsets
+        targets = self.targets
+        num_vertices = len(self.ids)
+        ranks = [1 / num_vertices] * num_vertices
+
+        for _ in range(iterations):
+            new_ranks = [0] * num_vertices
+            # Every vertex passes its rank on to the vertices it directs
+            # into, split evenly between them
+            for from_ind in range(num_vertices):
+                start, end = offsets[from_ind], offsets[from_ind + 1]
+                if start == end:
+                    continue
+                portion = ranks[from_ind] / (end - start)
+                for to_ind in targets[start:end]:
+                    new_ranks[to_ind] += portion
+            ranks = new_ranks
+
+        rank_list = list(zip(ranks, self.ids))
+        rank_list.sort(reverse=True)
+        return rank_list
+
+    def average_path(self):
+        """Return the average path of the graph."""
+        self.merge()
+        total_path_length = 0
+        for from_ind in range(len(self.ids)):
+            total_path_length += sum(
+                length for length in self.search(from_ind)[0] if length > 0)
+        total_edges = (self.num_vertices * (self.num_vertices - 1))
+        return total_path_length / total_edges
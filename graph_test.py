@@ -1,6 +1,15 @@
 #!python
 
-from graph import Graph, Vertex
+from array import array
+from graph import CSRGraph, Graph, Vertex, read_edge_list, GRAPH_HEADER
+from unittest import mock
+import gzip
+import os
+import random
+import re
+import sys
+import shutil
+import tempfile
 import unittest
 # Python 2 and 3 compatibility: unittest module renamed this assertion method
 if not hasattr(unittest.TestCase, 'assertCountEqual'):
@@ -52,6 +61,25 @@ class VertexTest(unittest.TestCase):
         v3.add_neighbor(v2, 3)
         self.assertCountEqual(v3.get_neighbors(), [v1, v2])
 
+    def test_neighbor_view(self):
+        v1 = Vertex(1)
+        v2 = Vertex(2)
+        v3 = Vertex(3)
+        view = v1.neighbor_view()
+        assert len(view) == 0 and v1.out_degree() == 0
+        v1.add_neighbor(v2)
+        v1.add_neighbor(v3, 3)
+        # The view follows the neighbors without being rebuilt
+        assert v2 in view and v1 not in view
+        self.assertCountEqual(view, [v2, v3])
+        assert v1.out_degree() == 2
+        # but can't change them
+        with self.assertRaises(AttributeError):
+            view.add(v1)
+        # Vertices have no per-instance dict
+        with self.assertRaises(AttributeError):
+            v1.color = "red"
+
     def test_get_id(self):
         # Test alphabetical ids
         v_a = Vertex("A")
@@ -81,6 +109,8 @@ class VertexTest(unittest.TestCase):
 
 
 class GraphTest(unittest.TestCase):
+    # The plain graph class, whatever Graph is patched to
+    graph_class = Graph
 
     def test_init(self):
         g = Graph()
@@ -216,6 +246,80 @@ class GraphTest(unittest.TestCase):
         g.add_edge('G', 'H', 5)
         assert v_g.get_edge_weight(v_h) == 5
 
+    def test_add_edges(self):
+        g = Graph()
+        g.add_edges([('A', 'B'), ('B', 'C', None), ('C', 'A')])
+        assert not g.weighted and g.num_vertices == 3
+        self.assertCountEqual(g.get_edge_list(),
+                              [('A', 'B'), ('B', 'C'), ('C', 'A')])
+        assert g.get_vertex('A') in g.get_vertex('B').predecessor_view()
+
+        # A duplicate stops the whole batch
+        with self.assertRaises(KeyError):
+            g.add_edges([('C', 'D'), ('A', 'B')])
+        with self.assertRaises(KeyError):
+            g.add_edges([('C', 'D'), ('C', 'D')])
+        assert g.num_vertices == 3
+        with self.assertRaises(ValueError):
+            g.add_edges([('C', 'D')], duplicates="first")
+
+        # Summing or replacing weights makes the graph weighted
+        g.add_edges([('A', 'B', 2), ('C', 'D', 5), ('C', 'D', 1)],
+                    duplicates="sum")
+        assert g.weighted
+        v_a = g.get_vertex('A')
+        v_c = g.get_vertex('C')
+        assert v_a.get_edge_weight(g.get_vertex('B')) == 3
+        assert v_c.get_edge_weight(g.get_vertex('D')) == 6
+        g.add_edges([('A', 'B', 0.5), ('C', 'D', 7)], duplicates="last")
+        assert v_a.get_edge_weight(g.get_vertex('B')) == 0.5
+        assert v_c.get_edge_weight(g.get_vertex('D')) == 7
+        assert g.get_vertex('D').predecessors == {v_c: 7}
+
+        # Undirected edges are stored both ways, once
+        u = Graph(directed=False)
+        u.add_edges([('A', 'B', 2), ('B', 'B', 1)])
+        assert u.get_vertex('B').get_edge_weight(u.get_vertex('A')) == 2
+        self.assertCountEqual(u.get_vertex('B').get_neighbors(),
+                              [u.get_vertex('A'), u.get_vertex('B')])
+        with self.assertRaises(KeyError):
+            u.add_edges([('B', 'A')])
+        u.add_edges([('B', 'A', 3)], duplicates="sum")
+        assert u.get_vertex('A').get_edge_weight(u.get_vertex('B')) == 5
+
+    def test_from_edge_arrays(self):
+        g = Graph.from_edge_arrays(array('i', [0, 1, 1]),
+                                   array('i', [1, 2, 0]),
+                                   array('q', [3, 4, 5]),
+                                   keys=['x', 'y', 'z', 'lonely'])
+        assert isinstance(g, Graph)
+        assert g.weighted and g.directed and g.num_vertices == 4
+        self.assertCountEqual(g.get_edge_list(), [
+            ('x', 'y', 3), ('y', 'z', 4), ('y', 'x', 5)])
+        assert list(g.vert_list) == ['x', 'y', 'z', 'lonely']
+
+        u = Graph.from_edge_arrays(['A', 'A'], ['B', 'B'], directed=False,
+                                   duplicates="sum")
+        # Summed weights are not all 1
+        assert u.weighted
+        assert u.get_vertex('B').get_edge_weight(u.get_vertex('A')) == 2
+        with self.assertRaises(ValueError):
+            Graph.from_edge_arrays([0, 1], [1])
+
+    def test_from_rows(self):
+        g = Graph.from_rows(['x', 'y', 'z', 'lonely'],
+                            [{2: 1, 1: 3}, {0: 5}, {}, {}])
+        assert isinstance(g, Graph)
+        assert g.weighted and g.directed and g.num_vertices == 4
+        self.assertCountEqual(g.get_edge_list(), [
+            ('x', 'y', 3), ('x', 'z', 1), ('y', 'x', 5)])
+        v_x = g.get_vertex('x')
+        assert g.get_vertex('y').get_edge_weight(v_x) == 5
+        self.assertCountEqual(g.get_vertex('z').predecessor_view(), [v_x])
+        # Edges can still be added
+        g.add_edge('z', 'lonely', 0.5)
+        assert g.get_vertex('lonely').in_degree() == 1
+
     def test_get_vertices(self):
         # Test getting alphabetical vertices
         g_letters = Graph()
@@ -400,6 +504,60 @@ class GraphTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             g.find_shortest_path("T", "A")
 
+    def test_shortest_path_tree(self):
+        g = Graph()
+        g.add_edges([('A', 'B'), ('A', 'C'), ('B', 'D'), ('C', 'D'),
+                     ('D', 'E'), ('F', 'A')])
+        v_a, v_b, v_c, v_d, v_e, v_f = [g.get_vertex(key) for key in "ABCDEF"]
+        distances, predecessors = g.shortest_path_tree(v_a)
+        self.assertDictEqual(distances, {v_a: 0, v_b: 1, v_c: 1, v_d: 2,
+                                         v_e: 3})
+        assert predecessors[v_a] is None
+        assert predecessors[v_d] in (v_b, v_c)
+        assert predecessors[v_e] == v_d
+        # Nothing is left on the vertices
+        assert all(vertex.parent is None for vertex in g)
+
+        # The search stops at the target
+        distances, _ = g.shortest_path_tree(v_a, v_b)
+        assert distances[v_b] == 1 and v_e not in distances
+        with self.assertRaises(ValueError):
+            g.shortest_path_tree(Vertex('Q'))
+
+        # Both directions give paths of the same length
+        path = g.find_shortest_path('F', 'E', bidirectional=True)
+        assert path[0] == v_f and path[-1] == v_e and len(path) == 5
+        assert path[1:3] == [v_a, v_b] or path[1:3] == [v_a, v_c]
+        assert g.find_shortest_path('E', 'F', bidirectional=True) is None
+        assert g.find_shortest_path('A', 'A', bidirectional=True) is None
+
+        rand = random.Random(1)
+        r = Graph()
+        r.add_edges({(rand.randrange(60), rand.randrange(60))
+                     for _ in range(150)})
+        for _ in range(50):
+            start, end = rand.sample(list(r.vert_list), 2)
+            path = r.find_shortest_path(start, end)
+            both = r.find_shortest_path(start, end, bidirectional=True)
+            if path is None:
+                assert both is None
+                continue
+            assert len(both) == len(path)
+            assert both[0].id == start and both[-1].id == end
+            for from_vert, to_vert in zip(both, both[1:]):
+                assert to_vert in from_vert.neighbor_view()
+
+    def test_diameter(self):
+        g = Graph(directed=False)
+        # Every vertex of a cycle is as far from the others
+        g.add_edges([(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 0)])
+        diameter, start, end = g.diameter()
+        assert diameter == 3
+        assert len(g.find_shortest_path(start.id, end.id)) == 4
+        g.add_edges([(5, 6)])
+        self.assertEqual(g.diameter(), (4, g.get_vertex(6),
+                                        g.get_vertex(2)))
+
     def test_depth_first_search(self):
         # Create graph
         g = Graph()
@@ -781,6 +939,35 @@ class GraphTest(unittest.TestCase):
             d.add_vertex("A")
             d.is_eulerian(is_connected=False)
 
+    def test_predecessors(self):
+        g = Graph(weighted=True)
+        g.add_edge('A', 'B', 2)
+        g.add_edge('A', 'C', 3)
+        g.add_edge('C', 'B', 4)
+        v_a = g.get_vertex('A')
+        v_b = g.get_vertex('B')
+        v_c = g.get_vertex('C')
+        self.assertCountEqual(v_b.predecessor_view(), [v_a, v_c])
+        assert v_b.in_degree() == 2 and v_a.in_degree() == 0
+        assert v_a in v_c.predecessor_view()
+        assert v_b not in v_c.predecessor_view()
+        self.assertDictEqual(dict(v_b.predecessors), {v_a: 2, v_c: 4})
+
+        # Sources are in the reverse map too
+        self.assertDictEqual(g.reverse_directions(),
+                             {v_a: set(), v_b: {v_a, v_c}, v_c: {v_a}})
+        # so influencer works on graphs with them
+        ranks = dict((key, rank) for rank, key in g.influencer(1))
+        self.assertDictEqual(ranks, {'A': 0, 'B': 0.5, 'C': 1 / 6})
+
+        # The index follows new edges
+        g.add_edge('B', 'A')
+        self.assertCountEqual(v_a.predecessor_view(), [v_b])
+        u = Graph(directed=False)
+        u.add_edge('A', 'B')
+        assert u.get_vertex('A').in_degree() == 1
+        assert u.get_vertex('B').in_degree() == 1
+
     def test_average_path(self):
         g = Graph(weighted=False, directed=True)
         # Graph should correctly calculate path length
@@ -791,6 +978,244 @@ class GraphTest(unittest.TestCase):
         g.add_edge('B', 'A')
         self.assertEqual(g.average_path(), 1)
 
+    def test_text_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_name = os.path.join(directory, "graph.txt")
+        # String ids, decimal weights and stray whitespace
+        with open(file_name, "w") as f:
+            f.write("D\nA, B,lonely\n\n(A,B,3)\n( B , C , 0.5 )\n(C,A,2)\n")
+        g = Graph()
+        g.make_graph_from_file(file_name)
+        assert g.directed and g.weighted
+        assert g.num_vertices == 4
+        self.assertCountEqual(g.get_edge_list(), [
+            ('A', 'B', 3), ('B', 'C', 0.5), ('C', 'A', 2)])
+        self.assertCountEqual(g.get_vertex('lonely').get_neighbors(), [])
+
+        # Gzipped undirected graph without weights, parsed in small pieces
+        gzip_name = os.path.join(directory, "graph.txt.gz")
+        with gzip.open(gzip_name, "wt") as f:
+            f.write("G\n" + "".join(f"({i},{i + 1})\n" for i in range(100)))
+        batches = [data for kind, data in read_edge_list(
+            gzip_name, chunk_size=16, batch_size=30) if kind == "edges"]
+        self.assertListEqual([len(batch) for batch in batches],
+                             [30, 30, 30, 10])
+        assert batches[0][0] == ('0', '1', None)
+        u = Graph()
+        u.make_graph_from_file(gzip_name)
+        assert not u.directed and not u.weighted
+        assert u.num_vertices == 101
+        assert u.get_vertex('1').get_neighbors() == {
+            u.get_vertex('0'), u.get_vertex('2')}
+
+        # A file without edges
+        with open(file_name, "w") as f:
+            f.write("G\n1,2\n")
+        e = Graph()
+        e.make_graph_from_file(file_name)
+        assert e.num_vertices == 2 and not e.get_edge_list()
+
+        # Anything else is not a graph file
+        with open(file_name, "w") as f:
+            f.write("X\n(A,B)\n")
+        with self.assertRaises(ValueError):
+            Graph().make_graph_from_file(file_name)
+
+    def test_malformed_text_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_name = os.path.join(directory, "graph.txt")
+        for line in ["(A,C,4", "(C,D,1,9)", "(New York,Boston,2)",
+                     "A,B", "(A,B,heavy)", "(A,B) x"]:
+            with open(file_name, "w") as f:
+                f.write(f"D\nA,B\n(A,B,3)\n\n{line}\n(B,A,1)\n")
+            message = f"line 5: {re.escape(repr(line))}"
+            for chunk_size in (4, 1 << 20):
+                with self.assertRaisesRegex(ValueError, message):
+                    list(read_edge_list(file_name, chunk_size=chunk_size))
+            with self.assertRaises(ValueError):
+                Graph().make_graph_from_file(file_name)
+
+        # A malformed last line without a newline
+        with open(file_name, "w") as f:
+            f.write("G\n(A,B)\n(B,C")
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            list(read_edge_list(file_name))
+
+    def test_binary_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_name = os.path.join(directory, "graph.bin")
+        # Weighted digraph with string ids
+        g = Graph(weighted=True, directed=True)
+        g.add_edge('ing', 'er', 3)
+        g.add_edge('er', 'ing', 5)
+        g.add_edge('er', 'ly', 1)
+        g.add_vertex('lonely')
+        g.save_binary_file(file_name)
+        d = Graph()
+        d.make_graph_from_binary_file(file_name)
+        assert d.directed and d.weighted
+        assert d.num_vertices == 4
+        self.assertCountEqual(d.get_edge_list(), g.get_edge_list())
+        self.assertCountEqual(d.get_vertex('lonely').get_neighbors(), [])
+
+        # Undirected graph with int ids and decimal weights
+        g = Graph(weighted=True, directed=False)
+        g.add_edge(1, 2, 0.5)
+        g.add_edge(2, 3, 2.25)
+        g.save_binary_file(file_name)
+        u = Graph()
+        u.make_graph_from_binary_file(file_name)
+        assert not u.directed
+        assert u.get_vertex(2).get_edge_weight(u.get_vertex(1)) == 0.5
+        assert u.get_vertex(3).get_edge_weight(u.get_vertex(2)) == 2.25
+
+        # Loading into a graph with edges still catches duplicates
+        with self.assertRaises(KeyError):
+            u.make_graph_from_binary_file(file_name)
+
+        # Empty graph
+        Graph().save_binary_file(file_name)
+        e = Graph()
+        e.make_graph_from_binary_file(file_name)
+        assert e.num_vertices == 0
+
+        # Mixed id types can't be stored
+        m = Graph()
+        m.add_edge('A', 1)
+        with self.assertRaises(TypeError):
+            m.save_binary_file(file_name)
+
+        # Ids containing the separator can't be stored
+        n = Graph()
+        n.add_edge('A\0B', 'C')
+        with self.assertRaises(ValueError):
+            n.save_binary_file(file_name)
+
+        # Anything else is not a graph file
+        with open(file_name, "wb") as f:
+            f.write(b"(A,B)")
+        with self.assertRaises(ValueError):
+            Graph().make_graph_from_binary_file(file_name)
+
+    def test_corrupt_binary_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_name = os.path.join(directory, "graph.bin")
+        g = Graph()
+        g.add_edge('A', 'B')
+        g.add_edge('B', 'C')
+        g.save_binary_file(file_name)
+        with open(file_name, "rb") as f:
+            data = f.read()
+        header = list(GRAPH_HEADER.unpack_from(data))
+
+        # A vertex table that doesn't match the number of vertices
+        header[5] = 4
+        with open(file_name, "wb") as f:
+            f.write(GRAPH_HEADER.pack(*header) + data[GRAPH_HEADER.size:])
+        with self.assertRaisesRegex(ValueError, "vertex table"):
+            Graph().make_graph_from_binary_file(file_name)
+
+        # An edge to a vertex that isn't in the table
+        targets = GRAPH_HEADER.size + 4 * header[7]
+        for index in (-1, 3):
+            with open(file_name, "wb") as f:
+                f.write(data[:targets] + array("i", [index]).tobytes()
+                        + data[targets + 4:])
+            with self.assertRaisesRegex(ValueError, "out of range"):
+                Graph().make_graph_from_binary_file(file_name)
+
+
+class CSRGraphTest(GraphTest):
+    """Run every GraphTest against CSRGraph."""
+
+    def setUp(self):
+        patcher = mock.patch.object(sys.modules[__name__], "Graph", CSRGraph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_arrays(self):
+        g = Graph(weighted=True)
+        assert isinstance(g, CSRGraph)
+        g.add_edge('C', 'A', 2)
+        g.add_edge('A', 'C', 4)
+        g.add_edge('A', 'B', 3)
+        v_a = g.get_vertex('A')
+        # Weights of edges not merged yet are read from pending
+        assert v_a.get_edge_weight(g.get_vertex('B')) == 3
+        assert g.get_vertex('B') in v_a.neighbor_view() and g.pending
+        assert v_a.out_degree() == 2 and not g.pending
+        # Rows are sorted by vertex index: C=0, A=1, B=2
+        self.assertListEqual(list(g.offsets), [0, 1, 3, 3])
+        self.assertListEqual(list(g.targets), [1, 0, 2])
+        self.assertListEqual(list(g.weights), [2, 4, 3])
+        assert g.weights.typecode == "q"
+
+        # Edges added after a read are merged on the next read
+        g.add_edge('B', 'D', 0.5)
+        self.assertDictEqual(dict(g.get_vertex('B').neighbors),
+                             {g.get_vertex('D'): 0.5})
+        # The neighbor mappings are read-only
+        with self.assertRaises(TypeError):
+            g.get_vertex('B').neighbors[v_a] = 1
+        with self.assertRaises(TypeError):
+            g.get_vertex('B').predecessors[v_a] = 1
+        assert g.weights.typecode == "d"
+        with self.assertRaises(KeyError):
+            g.add_edge('A', 'B', 1)
+        with self.assertRaises(KeyError):
+            v_a.get_edge_weight(g.get_vertex('D'))
+        with self.assertRaises(TypeError):
+            g.add_edge('A', 'D', "heavy")
+        # Vertices are the same objects on every call
+        assert g.get_vertex('A') is v_a
+        # Neighbor views read the arrays
+        view = v_a.neighbor_view()
+        assert v_a.out_degree() == len(view) == 2
+        assert g.get_vertex('C') in view and v_a not in view
+        self.assertSetEqual(set(view), v_a.get_neighbors())
+
+    def test_binary_file_adopts_arrays(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        file_name = os.path.join(directory, "graph.bin")
+        edges = [('C', 'A', 2), ('A', 'C', 4), ('A', 'B', 3), ('B', 'A', 1)]
+        # Written in row order by a CSRGraph, in insertion order by a Graph
+        for graph_class in (Graph, GraphTest.graph_class):
+            g = graph_class(weighted=True)
+            g.add_edges(edges)
+            g.save_binary_file(file_name)
+            c = Graph()
+            c.make_graph_from_binary_file(file_name)
+            assert not c.pending
+            self.assertListEqual(list(c.offsets), [0, 1, 3, 4])
+            self.assertListEqual(list(c.targets), [1, 0, 2, 1])
+            self.assertListEqual(list(c.weights), [2, 4, 3, 1])
+            self.assertCountEqual(c.get_edge_list(), edges)
+
+    def test_influencer_and_diameter(self):
+        for directed in (True, False):
+            edges = [('A', 'B'), ('B', 'C'), ('C', 'A'), ('C', 'D'),
+                     ('D', 'E'), ('E', 'A')]
+            graphs = []
+            for graph_class in (Graph, GraphTest.graph_class):
+                g = graph_class(directed=directed)
+                for from_key, to_key in edges:
+                    g.add_edge(from_key, to_key)
+                graphs.append(g)
+            csr, plain = graphs
+            plain_ranks = {key: rank for rank, key in plain.influencer()}
+            for rank, key in csr.influencer():
+                self.assertAlmostEqual(rank, plain_ranks[key])
+            self.assertAlmostEqual(csr.average_path(), plain.average_path())
+            diameter, start, end = csr.diameter()
+            path = csr.find_shortest_path(start.id, end.id)
+            assert len(path) == diameter + 1
+            assert diameter == (4 if directed else 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,129 @@
+import hashlib
+import heapq
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
 import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from functools import partial
+from itertools import chain, islice
+from multiprocessing import Pool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 # Words from https://github.com/dolph/dictionary
 # Patterns from https://gist.githubusercontent.com/cosmologicon/1e7291714094d71a0e25678316141586/raw/006f7e9093dc7ad72b12ff9f1da649822e56d39d/tex-hyphenation-patterns.txt
 # Code from https://www.reddit.com/r/dailyprogrammer/comments/8qxpqd/20180613_challenge_363_intermediate_word/e2uhjs5/
 
 
+ALPHABET = ".abcdefghijklmnopqrstuvwxyz"
+LETTER_CODES = {letter: code for code, letter in enumerate(ALPHABET)}
+
+
+class MatchStats:
+    """Counters and timers for the matching path.
+
+    Collected by break_positions, batch_break_positions, and the pure
+    Python attempt_to_match_pattern and Trie.add, while this is the
+    module's matchStats (see enable_stats). map_chunks merges in the
+    statistics of its worker processes. Word latencies are counted in
+    power of two buckets of microseconds, and the slowest words are kept
+    for a closer look.
+    """
+
+    def __init__(self, slowest=10):
+        self.counters = Counter()
+        # Number of matches of each pattern, by its letters
+        self.patterns = Counter()
+        # name -> [calls, seconds]
+        self.timers = {}
+        # Upper bound of the bucket in microseconds -> words
+        self.latency = Counter()
+        # Min-heap of (seconds, word) of the slowest words
+        self.slowest = []
+        self.keep = slowest
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+    def word_time(self, word, seconds):
+        """Record the time break_positions took for word."""
+        self.add_time("break_positions", seconds)
+        self.latency[1 << max(0, int(seconds * 1e6)).bit_length()] += 1
+        self.keep_slowest(seconds, word)
+
+    def batch_time(self, words, seconds):
+        """Record the time a batch engine took for words. The words share
+        the time evenly, so they are not ranked among the slowest."""
+        timer = self.timers.setdefault("break_positions", [0, 0.0])
+        timer[0] += len(words)
+        timer[1] += seconds
+        if words:
+            bucket = 1 << max(0, int(seconds / len(words) * 1e6)).bit_length()
+            self.latency[bucket] += len(words)
+
+    def keep_slowest(self, seconds, word):
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (seconds, word))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, word))
+
+    def merge(self, other):
+        """Add the numbers collected in other, like those of a worker
+        process."""
+        self.counters.update(other.counters)
+        self.patterns.update(other.patterns)
+        for name, (calls, seconds) in other.timers.items():
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+        self.latency.update(other.latency)
+        for seconds, word in other.slowest:
+            self.keep_slowest(seconds, word)
+
+    def report(self, topPatterns=20):
+        """Return the collected numbers as a dict of plain values, ready
+        for json.dump."""
+        return {
+            "counters": dict(self.counters),
+            "timers": {name: {"calls": calls, "seconds": seconds}
+                       for name, (calls, seconds) in self.timers.items()},
+            "latency_us": dict(sorted(self.latency.items())),
+            "slowest_words": [{"word": word, "seconds": seconds}
+                              for seconds, word in sorted(self.slowest,
+                                                          reverse=True)],
+            "top_patterns": self.patterns.most_common(topPatterns),
+        }
+
+
+# Statistics being collected, or None when instrumentation is off, which
+# leaves a single global lookup in the instrumented functions
+matchStats = None
+
+
+def enable_stats(stats=None):
+    """Start collecting into stats (a new MatchStats by default) and
+    return it."""
+    global matchStats
+    matchStats = stats if stats is not None else MatchStats()
+    return matchStats
+
+
+def disable_stats():
+    """Stop collecting and return what was collected, if anything."""
+    global matchStats
+    stats, matchStats = matchStats, None
+    return stats
+
+
 class TrieNode:
     def __init__(self, letter, value, parent, isWord):
         self.letter = letter
@@ -41,6 +161,8 @@ class TrieNode:
 class Trie:
     def __init__(self):
         self.children = {}
+        # Pre-hyphenated words that bypass matching, see read_exceptions_file
+        self.exceptions = {}
 
     def get(self, key):
         if key in self.children:
@@ -62,6 +184,8 @@ class Trie:
         return valueDict
 
     def add(self, word):
+        if matchStats is not None:
+            start = time.perf_counter()
         valueDict = self.create_value_dict(word)
         modifiedWord = ''.join([i for i in word if not i.isdigit()])
 
@@ -76,21 +200,680 @@ class Trie:
             if isLastLetter:
                 currentParent.set_value(valueDict)
 
+        if matchStats is not None:
+            matchStats.add_time("Trie.add", time.perf_counter() - start)
+            matchStats.counters["patterns added"] += 1
 
-def read_patterns_file():
-    start = time.time()
-    trie = Trie()
-    content = []
-    with open("patterns.txt") as file:
-        content = [line.rstrip() for line in file]
-        file.close()
-    for line in content:
+    def patterns(self):
+        """Yield (letters, valueDict) for every pattern the trie can match."""
+        stack = [(node, node.get_letter()) for node in self.children.values()]
+        while stack:
+            node, letters = stack.pop()
+            if node.get_is_word():
+                yield letters, node.get_value()
+            for child in node.children.values():
+                stack.append((child, letters + child.get_letter()))
+
+    def match(self, word):
+        return find_values(word, self)
+
+
+class ArrayTrie:
+    """Pattern trie stored in flat integer arrays instead of TrieNode objects.
+
+    Node 0 is the root. The children of a node are a row of len(ALPHABET)
+    entries in `children`, so finding a child is index arithmetic; 0 marks a
+    missing child since the root is never one. The digit values of a
+    pattern are packed into `valuePositions`/`valueDigits`, and
+    `valueStart` holds the offset of each node's values in those arrays.
+    """
+
+    def __init__(self):
+        self.exceptions = {}
+        self.children = array("i", [0] * len(ALPHABET))
+        self.isWord = bytearray(1)
+        self.letters = bytearray(1)
+        self.valueRecord = array("i", [-1])
+        self.valueStart = array("i", [0])
+        self.valuePositions = array("b")
+        self.valueDigits = array("b")
+
+    def __len__(self):
+        return len(self.isWord)
+
+    def child(self, node, letter):
+        code = LETTER_CODES.get(letter)
+        if code is None:
+            return -1
+        child = self.children[node * len(ALPHABET) + code]
+        return child if child != 0 else -1
+
+    def get(self, key):
+        return self.child(0, key)
+
+    def add_child(self, node, letter, isWord):
+        code = LETTER_CODES.get(letter)
+        if code is None:
+            raise ValueError(f"Pattern letter {letter!r} is not in ALPHABET")
+        slot = node * len(ALPHABET) + code
+        if self.children[slot] == 0:
+            self.children[slot] = len(self.isWord)
+            self.children.extend([0] * len(ALPHABET))
+            self.isWord.append(isWord)
+            self.letters.append(ord(letter))
+            self.valueRecord.append(-1)
+        return self.children[slot]
+
+    def add(self, word):
+        letters = []
+        positions = []
+        digits = []
+        for character in word:
+            if character.isdigit():
+                positions.append(len(letters) - (letters[:1] == ["."]))
+                digits.append(int(character))
+            else:
+                letters.append(character)
+
+        # Same rules as Trie.add: a node only becomes a word when it is
+        # created as the last letter of a pattern
+        node = self.add_child(0, letters[0], False)
+        for x in range(1, len(letters)):
+            isLastLetter = (x == len(letters)-1)
+            node = self.add_child(node, letters[x], isLastLetter)
+            if isLastLetter:
+                self.valueRecord[node] = len(self.valueStart) - 1
+                self.valuePositions.extend(positions)
+                self.valueDigits.extend(digits)
+                self.valueStart.append(len(self.valuePositions))
+
+    def get_value(self, node):
+        record = self.valueRecord[node]
+        if record == -1:
+            return {}
+        valueDict = {}
+        for x in range(self.valueStart[record], self.valueStart[record + 1]):
+            valueDict[self.valuePositions[x]] = self.valueDigits[x]
+        return valueDict
+
+    def patterns(self):
+        """Yield (letters, valueDict) for every pattern the trie can match."""
+        size = len(ALPHABET)
+        stack = [(0, "")]
+        while stack:
+            node, letters = stack.pop()
+            if self.isWord[node]:
+                yield letters, self.get_value(node)
+            row = node * size
+            for code in range(size):
+                child = self.children[row + code]
+                if child != 0:
+                    stack.append((child, letters + ALPHABET[code]))
+
+    def match(self, word):
+        text = "." + word + "."
+        values = [0] * (len(word) + 2)
+        children = self.children
+        isWord = self.isWord
+        size = len(ALPHABET)
+        codes = [LETTER_CODES.get(letter, -1) for letter in text]
+        for start in range(0, len(text) - 1):
+            # Positions ignore the leading dot; the word starts at index 1
+            base = start - 1 if start > 0 else 0
+            # A match from the start never uses the closing dot
+            end = len(text) if start > 0 else len(text) - 1
+            node = 0
+            for x in range(start, end):
+                if codes[x] == -1:
+                    break
+                node = children[node * size + codes[x]]
+                if node == 0:
+                    break
+                if isWord[node]:
+                    record = self.valueRecord[node]
+                    for y in range(self.valueStart[record],
+                                   self.valueStart[record + 1]):
+                        position = base + self.valuePositions[y]
+                        if values[position] < self.valueDigits[y]:
+                            values[position] = self.valueDigits[y]
+        return values
+
+
+def scan_patterns(trie):
+    """Yield (letters, shift, valueDict) for the patterns of trie that the
+    engines matching against "." + word + "." use.
+
+    parse_word never matches a pattern against both ends of a word at
+    once, so such patterns are left out. Value positions ignore a leading
+    dot while the scanned text doesn't, so shift is 1 for patterns that
+    start with one.
+    """
+    for letters, valueDict in trie.patterns():
+        if letters[0] == "." and letters[-1] == ".":
+            continue
+        yield letters, 1 if letters[0] == "." else 0, valueDict
+
+
+class Automaton:
+    """Aho-Corasick automaton compiled from the patterns of a trie.
+
+    Scans "." + word + "." once instead of restarting a trie walk at every
+    index. Transitions are stored as a dense table of len(ALPHABET) entries
+    per state, with failure links already folded in; a state is identified
+    by the offset of its row in that table. The values of every pattern
+    ending in a state (including those reached through failure links) are
+    stored as (offset, value) pairs, where offset is relative to the index
+    of the last scanned letter.
+    """
+
+    def __init__(self, trie):
+        self.exceptions = {}
+        goto = [{}]
+        outputs = [{}]
+        for letters, shift, valueDict in scan_patterns(trie):
+            if any(letter not in LETTER_CODES for letter in letters):
+                continue
+            state = 0
+            for letter in letters:
+                code = LETTER_CODES[letter]
+                if code not in goto[state]:
+                    goto[state][code] = len(goto)
+                    goto.append({})
+                    outputs.append({})
+                state = goto[state][code]
+            for position, value in valueDict.items():
+                offset = position + shift - len(letters)
+                if outputs[state].get(offset, 0) < value:
+                    outputs[state][offset] = value
+
+        size = len(ALPHABET)
+        fail = [0] * len(goto)
+        delta = [0] * (len(goto) * size)
+        queue = deque()
+        for code, child in goto[0].items():
+            delta[code] = child * size
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for offset, value in outputs[fail[state] // size].items():
+                if outputs[state].get(offset, 0) < value:
+                    outputs[state][offset] = value
+            row = state * size
+            for code in range(size):
+                child = goto[state].get(code)
+                if child is None:
+                    delta[row + code] = delta[fail[state] + code]
+                else:
+                    fail[child] = delta[fail[state] + code]
+                    delta[row + code] = child * size
+                    queue.append(child)
+
+        self.delta = array("i", delta)
+        self.outStart = array("i", [0])
+        self.outOffset = array("i")
+        self.outValue = array("i")
+        for stateOutputs in outputs:
+            for offset, value in sorted(stateOutputs.items()):
+                self.outOffset.append(offset)
+                self.outValue.append(value)
+            self.outStart.append(len(self.outOffset))
+        self.index_outputs()
+
+    @classmethod
+    def from_arrays(cls, delta, outStart, outOffset, outValue):
+        """Create an automaton from previously compiled tables."""
+        automaton = cls.__new__(cls)
+        automaton.exceptions = {}
+        automaton.delta = delta
+        automaton.outStart = outStart
+        automaton.outOffset = outOffset
+        automaton.outValue = outValue
+        automaton.index_outputs()
+        return automaton
+
+    def index_outputs(self):
+        """Key the (offset, value) pairs by state row for the matching loop."""
+        size = len(ALPHABET)
+        self.outputs = {}
+        for state in range(len(self.outStart) - 1):
+            start, end = self.outStart[state], self.outStart[state + 1]
+            if start != end:
+                self.outputs[state * size] = tuple(
+                    zip(self.outOffset[start:end], self.outValue[start:end]))
+
+    def match(self, word):
+        values = [0] * (len(word) + 2)
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        index = 0
+        for letter in "." + word + ".":
+            code = LETTER_CODES.get(letter)
+            state = 0 if code is None else delta[state + code]
+            stateOutputs = outputs.get(state)
+            if stateOutputs:
+                for offset, value in stateOutputs:
+                    position = index + offset
+                    if values[position] < value:
+                        values[position] = value
+            index += 1
+        return values
+
+
+class SubstringTable:
+    """Matcher that looks up every substring of a word in a dict.
+
+    Patterns are keyed by their letters, with their values precomputed as
+    (offset, value) pairs relative to the start of the pattern in
+    "." + word + ".". Since patterns are short, each word only has a
+    bounded number of substrings to look up. Every prefix of a pattern is
+    in the table too (with no values), so the lookups from a start index
+    stop at the first substring that no pattern begins with.
+    """
+
+    def __init__(self, trie):
+        self.exceptions = {}
+        self.table = {}
+        for letters, shift, valueDict in scan_patterns(trie):
+            self.table[letters] = tuple(
+                (position + shift - 1, value)
+                for position, value in sorted(valueDict.items()))
+        for letters in list(self.table):
+            for end in range(1, len(letters)):
+                self.table.setdefault(letters[:end], ())
+        self.maxLength = max(map(len, self.table), default=0)
+
+    def match(self, word):
+        text = "." + word + "."
+        values = [0] * (len(word) + 2)
+        table = self.table
+        for start in range(0, len(text)):
+            stop = min(start + self.maxLength, len(text))
+            for end in range(start + 1, stop + 1):
+                found = table.get(text[start:end])
+                if found is None:
+                    break
+                for offset, value in found:
+                    if values[start + offset] < value:
+                        values[start + offset] = value
+        return values
+
+
+class NumpyEngine:
+    """Vectorized matcher that hyphenates a batch of words at once.
+
+    Each word is encoded as "." + word + "." in a row of a padded uint8
+    matrix, with 5 bits per letter so that every substring of up to
+    MAX_LETTERS letters packs exactly into an int64 key. For each pattern
+    length, the keys of all substrings of that length are looked up in the
+    sorted keys of the patterns at once, and the pattern values are
+    max-reduced into a value matrix by shifted slices.
+    """
+
+    MAX_LETTERS = 12
+    # 0 pads the matrix; letters outside ALPHABET get a code no pattern has
+    UNKNOWN = len(ALPHABET) + 1
+
+    def __init__(self, trie):
+        if numpy is None:
+            raise ImportError("the numpy engine requires numpy")
+        self.exceptions = {}
+        byLength = {}
+        for letters, shift, valueDict in scan_patterns(trie):
+            if any(letter not in LETTER_CODES for letter in letters):
+                continue
+            if len(letters) > self.MAX_LETTERS:
+                raise ValueError(f"Pattern {letters!r} is too long")
+            key = self.pack([LETTER_CODES[letter] + 1 for letter in letters])
+            values = [0] * (len(letters) + 1)
+            for position, value in valueDict.items():
+                values[position + shift] = value
+            byLength.setdefault(len(letters), {})[key] = values
+
+        # length -> (sorted pattern keys, values of each pattern by position)
+        self.tables = {}
+        for length, patterns in byLength.items():
+            keys = sorted(patterns)
+            self.tables[length] = (
+                numpy.array(keys, dtype=numpy.int64),
+                numpy.array([patterns[key] for key in keys],
+                            dtype=numpy.uint8))
+        self.codes = numpy.full(128, self.UNKNOWN, dtype=numpy.uint8)
+        for letter, code in LETTER_CODES.items():
+            self.codes[ord(letter)] = code + 1
+
+    @staticmethod
+    def pack(codes):
+        key = 0
+        for x, code in enumerate(codes):
+            key |= code << (5 * x)
+        return key
+
+    def encode(self, words):
+        """Return the padded code matrix of "." + word + "." for words."""
+        texts = ["." + word + "." for word in words]
+        lengths = numpy.array([len(text) for text in texts], dtype=numpy.int64)
+        width = int(lengths.max()) if len(texts) else 2
+        matrix = numpy.zeros((len(texts), width), dtype=numpy.uint8)
+        # Non-ASCII letters become "?", which is an unknown letter
+        joined = "".join(texts).encode("ascii", "replace")
+        codes = self.codes[numpy.frombuffer(joined, dtype=numpy.uint8)]
+        rows = numpy.repeat(numpy.arange(len(texts)), lengths)
+        starts = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        matrix[rows, numpy.arange(len(codes)) - starts] = codes
+        return matrix
+
+    def match_batch(self, words):
+        """Return a matrix of the values at each position of each word.
+
+        Row r holds the values of words[r] at word positions 0, 1, ...
+        like trie.match(words[r]).
+        """
+        matrix = self.encode(words).astype(numpy.int64)
+        rows, width = matrix.shape
+        # values[:, p] is the value before position p of "." + word + "."
+        values = numpy.zeros((rows, width + 1), dtype=numpy.uint8)
+        keys = numpy.zeros((rows, width), dtype=numpy.int64)
+        for length in range(1, min(width, self.MAX_LETTERS) + 1):
+            starts = width - length + 1
+            # keys[:, s] packs the `length` letters starting at s
+            keys = keys[:, :starts] | \
+                (matrix[:, length - 1:] << (5 * (length - 1)))
+            if length not in self.tables:
+                continue
+            patternKeys, patternValues = self.tables[length]
+            found = numpy.searchsorted(patternKeys, keys)
+            found[found == len(patternKeys)] = 0
+            matched = patternKeys[found] == keys
+            if not matched.any():
+                continue
+            for offset in range(length + 1):
+                candidate = numpy.where(matched,
+                                        patternValues[found, offset], 0)
+                target = values[:, offset:offset + starts]
+                numpy.maximum(target, candidate, out=target)
+        return values[:, 1:]
+
+    def match(self, word):
+        return self.match_batch([word])[0].tolist()
+
+    def break_positions_batch(self, words):
+        """Return the break_positions of every word in words."""
+        values = self.match_batch(words)
+        odd = (values & 1).astype(bool)
+        # Only positions strictly inside each word can break
+        lengths = numpy.array([len(word) for word in words], dtype=numpy.int64)
+        odd[:, 0] = False
+        odd &= numpy.arange(values.shape[1]) < lengths[:, None]
+        rows, columns = numpy.nonzero(odd)
+        ends = numpy.cumsum(numpy.bincount(rows, minlength=len(words)))
+        columns = columns.tolist()
+        start = 0
+        positions = []
+        for end in ends.tolist():
+            positions.append(columns[start:end])
+            start = end
+        return positions
+
+
+def build_trie(lines, trieClass=Trie):
+    trie = trieClass()
+    for line in lines:
         trie.add(line)
+    return trie
+
+
+ENGINES = {
+    "trie": build_trie,
+    "array-trie": lambda lines: build_trie(lines, ArrayTrie),
+    "aho-corasick": lambda lines: Automaton(build_trie(lines, ArrayTrie)),
+    "substring": lambda lines: SubstringTable(build_trie(lines, ArrayTrie)),
+    "numpy": lambda lines: NumpyEngine(build_trie(lines, ArrayTrie)),
+}
+DEFAULT_ENGINE = "aho-corasick"
+
+
+# magic, sha256 of the pattern file, item size, then the four table lengths
+CACHE_HEADER = struct.Struct("=8s32s5i")
+CACHE_MAGIC = b"HYPHAC01"
+CACHE_TABLES = ("delta", "outStart", "outOffset", "outValue")
+
+
+def save_automaton(automaton, cacheName, digest):
+    """Write the automaton tables to cacheName, stamped with digest."""
+    tables = [array("i", getattr(automaton, name)) for name in CACHE_TABLES]
+    header = CACHE_HEADER.pack(CACHE_MAGIC, digest, tables[0].itemsize,
+                               *[len(table) for table in tables])
+    # Write next to the cache and rename, so readers never see half a file
+    tempName = f"{cacheName}.{os.getpid()}.tmp"
+    with open(tempName, "wb") as file:
+        file.write(header)
+        for table in tables:
+            table.tofile(file)
+    os.replace(tempName, cacheName)
+
+
+def load_automaton(cacheName, digest):
+    """Memory-map an automaton from cacheName.
+
+    Return None if the cache is missing, corrupt, or was built from a
+    pattern file with a different digest.
+    """
+    try:
+        with open(cacheName, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(buffer) < CACHE_HEADER.size:
+        return None
+    magic, cacheDigest, itemSize, *lengths = \
+        CACHE_HEADER.unpack_from(buffer)
+    expectedSize = CACHE_HEADER.size + itemSize * sum(lengths)
+    if (magic != CACHE_MAGIC or cacheDigest != digest
+            or itemSize != array("i").itemsize or len(buffer) != expectedSize):
+        return None
+
+    view = memoryview(buffer)
+    tables = []
+    offset = CACHE_HEADER.size
+    for length in lengths:
+        end = offset + itemSize * length
+        tables.append(view[offset:end].cast("i"))
+        offset = end
+    automaton = Automaton.from_arrays(*tables)
+    # Keep the mapping alive for as long as the automaton uses it
+    automaton.buffer = buffer
+    return automaton
+
+
+def read_exceptions_file(fileName):
+    """Read a TeX style list of pre-hyphenated words, like "as-so-ciate".
+
+    Words are separated by whitespace and "%" starts a comment. Return a
+    dict of each unhyphenated word and its break positions.
+    """
+    exceptions = {}
+    with open(fileName) as file:
+        for line in file:
+            for hyphenated in line.split("%")[0].split():
+                positions = []
+                letters = 0
+                for character in hyphenated:
+                    if character == "-":
+                        positions.append(letters)
+                    else:
+                        letters += 1
+                exceptions[hyphenated.replace("-", "")] = tuple(positions)
+    return exceptions
+
+
+def load_patterns(fileName="patterns.txt", engine=DEFAULT_ENGINE, cache=True,
+                  exceptionsFile=None):
+    """Build the pattern matcher for engine from a TeX pattern file.
+
+    The compiled Aho-Corasick automaton is cached in fileName + ".cache"
+    and memory-mapped on later runs, until the pattern file changes. Words
+    in exceptionsFile are hyphenated as listed there instead of by the
+    patterns.
+    """
+    with open(fileName, "rb") as file:
+        raw = file.read()
+        file.close()
+    useCache = cache and engine == "aho-corasick"
+    digest = hashlib.sha256(raw).digest()
+    cacheName = fileName + ".cache"
+
+    trie = load_automaton(cacheName, digest) if useCache else None
+    if trie is None:
+        content = [line.rstrip() for line in raw.decode().splitlines()]
+        trie = ENGINES[engine](content)
+        if useCache:
+            try:
+                save_automaton(trie, cacheName, digest)
+            except OSError:
+                pass
+    if exceptionsFile is not None:
+        trie.exceptions = read_exceptions_file(exceptionsFile)
+        with open(exceptionsFile, "rb") as file:
+            digest = hashlib.sha256(digest + file.read()).digest()
+    trie.digest = digest
+    return trie
+
+
+def read_patterns_file(fileName="patterns.txt", engine=DEFAULT_ENGINE,
+                       cache=True, exceptionsFile=None):
+    start = time.time()
+    trie = load_patterns(fileName, engine, cache, exceptionsFile)
     end = time.time()
     print(str(end - start) + " trie built")
     return trie
 
 
+def pattern_bytes(trie):
+    """Estimate the memory held by a compiled pattern matcher.
+
+    Buffers count their size in bytes and other objects are walked
+    through their attributes and items. Memory-mapped files are left out,
+    since their pages belong to the operating system's file cache.
+    """
+    seen = set()
+    stack = [trie]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, mmap.mmap):
+            continue
+        seen.add(id(item))
+        if isinstance(item, memoryview):
+            # Views into a memory-mapped file are not counted either
+            if not isinstance(item.obj, mmap.mmap):
+                size += item.nbytes
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.extend(vars(item).values())
+    return size
+
+
+class PatternRegistry:
+    """Pattern sets for several languages, compiled when first used.
+
+    Languages are registered with their pattern file (and optional
+    exceptions file) up front, which costs nothing. get(language) loads
+    the set on first use through load_patterns, and keeps it in memory
+    until the loaded sets together take more than maxBytes, at which
+    point the least recently used ones are dropped. A registry can be
+    shared between threads: each set is compiled once, while other
+    languages stay available.
+    """
+
+    def __init__(self, maxBytes=64 << 20, engine=DEFAULT_ENGINE, cache=True):
+        self.maxBytes = maxBytes
+        self.engine = engine
+        self.cache = cache
+        self.files = {}
+        self.loaded = OrderedDict()
+        self.sizes = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def __contains__(self, language):
+        return language in self.files
+
+    def __len__(self):
+        return len(self.loaded)
+
+    def languages(self):
+        return sorted(self.files)
+
+    def register(self, language, fileName, exceptionsFile=None):
+        """Add or replace the pattern files of language."""
+        with self.lock:
+            self.files[language] = (fileName, exceptionsFile)
+            self.discard(language)
+
+    def discard(self, language):
+        """Drop the loaded pattern set of language, if any."""
+        self.loaded.pop(language, None)
+        self.sizes.pop(language, None)
+
+    def nbytes(self):
+        return sum(self.sizes.values())
+
+    def get(self, language):
+        """Return the pattern matcher of language, loading it if needed.
+
+        Raise KeyError if language was never registered.
+        """
+        with self.lock:
+            trie = self.loaded.get(language)
+            if trie is not None:
+                self.loaded.move_to_end(language)
+                return trie
+            fileName, exceptionsFile = self.files[language]
+            # One lock per language, so it is only compiled once
+            languageLock = self.loading.setdefault(language, threading.Lock())
+
+        with languageLock:
+            with self.lock:
+                trie = self.loaded.get(language)
+                if trie is not None:
+                    self.loaded.move_to_end(language)
+                    return trie
+            trie = load_patterns(fileName, self.engine, self.cache,
+                                 exceptionsFile)
+            size = pattern_bytes(trie)
+            with self.lock:
+                # The files may have been replaced while this one loaded
+                if self.files.get(language) == (fileName, exceptionsFile):
+                    self.loaded[language] = trie
+                    self.sizes[language] = size
+                    self.loads += 1
+                    self.evict(keep=language)
+            return trie
+
+    def evict(self, keep=None):
+        """Drop least recently used sets until they fit in maxBytes."""
+        for language in list(self.loaded):
+            if self.nbytes() <= self.maxBytes:
+                break
+            if language != keep:
+                self.discard(language)
+
+
+# Languages this module ships patterns for, found next to it rather than
+# in the working directory
+HERE = os.path.dirname(os.path.abspath(__file__))
+registry = PatternRegistry()
+registry.register("en", os.path.join(HERE, "patterns.txt"))
+
+
 def attempt_to_match_pattern(index, word, trie):
     pattern = ""
     nextNode = trie
@@ -104,17 +887,24 @@ def attempt_to_match_pattern(index, word, trie):
             if nextNode.get_is_word():
                 resultDict = nextNode.get_value()
                 pattern = ""
+                if matchStats is not None:
+                    matchStats.counters["patterns matched"] += 1
+                    matchStats.counters["dict merges"] += len(resultDict)
+                    matchStats.patterns[word[index:x + 1]] += 1
                 for x in resultDict.items():
                     previousValue = valueDict.get(x[0]+index, 0)
                     if previousValue < x[1]:
                         valueDict[x[0]+index] = x[1]
         else:
+            if matchStats is not None:
+                matchStats.counters["nodes visited"] += x - index
             return valueDict if len(valueDict) > 0 else False
+    if matchStats is not None:
+        matchStats.counters["nodes visited"] += len(word) - index
     return valueDict if len(valueDict) > 0 else False
 
 
-def parse_word(word, trie):
-    values = [0] * len(word)
+def find_values(word, trie):
     results = []
     for x in range(0, len(word)):
         res = attempt_to_match_pattern(x, word, trie)
@@ -132,26 +922,370 @@ def parse_word(word, trie):
             if mainDict.setdefault(x[0], 0) < x[1]:
                 mainDict[x[0]] = x[1]
 
-    finalWord = ""
-    for x in range(0, len(word)):
-        if(mainDict.get(x) is not None and mainDict.get(x) % 2 != 0 and x != 0 and x != len(word)):
-            finalWord += "-"
-        finalWord += word[x]
-    return finalWord
+    values = [0] * (len(word) + 1)
+    for x in mainDict.items():
+        if x[0] < len(values):
+            values[x[0]] = x[1]
+    return values
+
+
+def odd_positions(word, values):
+    """Return the positions inside word whose match value is odd."""
+    return [x for x in range(1, len(word)) if values[x] & 1]
+
+
+def break_positions(word, trie):
+    """Return the indices of word that start a new syllable."""
+    stats = matchStats
+    if stats is not None:
+        start = time.perf_counter()
+    positions = trie.exceptions.get(word)
+    if positions is not None:
+        positions = list(positions)
+    else:
+        positions = odd_positions(word, trie.match(word))
+    if stats is not None:
+        stats.word_time(word, time.perf_counter() - start)
+    return positions
+
+
+def batch_break_positions(words, trie):
+    """Return break_positions of every word, batching where trie can."""
+    if not hasattr(trie, "break_positions_batch"):
+        return [break_positions(word, trie) for word in words]
+    stats = matchStats
+    if stats is not None:
+        start = time.perf_counter()
+    results = trie.break_positions_batch(words)
+    for x, word in enumerate(words):
+        if word in trie.exceptions:
+            results[x] = list(trie.exceptions[word])
+    if stats is not None:
+        stats.batch_time(words, time.perf_counter() - start)
+    return results
+
+
+def break_mask(word, trie):
+    """Return the break positions of word as bits of an int."""
+    mask = 0
+    for x in break_positions(word, trie):
+        mask |= 1 << x
+    return mask
+
+
+def syllable_spans(word, positions):
+    """Return (start, end) offsets of each syllable given break positions."""
+    bounds = [0] + positions + [len(word)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def syllable_count(word, trie):
+    return len(break_positions(word, trie)) + 1 if word else 0
+
+
+def split_pairs(word, positions):
+    """Yield every pair of adjacent syllables given break positions."""
+    bounds = [0] + positions + [len(word)]
+    for x in range(len(bounds) - 2):
+        yield word[bounds[x]:bounds[x + 1]], word[bounds[x + 1]:bounds[x + 2]]
+
+
+def count_pairs(entries, syllables=None):
+    """Return a Counter of the adjacent syllable pairs of (word, break
+    positions) entries, in first-seen order.
+
+    If syllables is given, only pairs where both syllables are in it are
+    counted.
+    """
+    pairCounts = Counter()
+    for word, positions in entries:
+        for pair in split_pairs(word, positions):
+            if syllables is None or (pair[0] in syllables
+                                     and pair[1] in syllables):
+                pairCounts[pair] += 1
+    return pairCounts
+
+
+def syllable_pairs(word, trie):
+    """Yield every pair of adjacent syllables of word."""
+    return split_pairs(word, break_positions(word, trie))
+
+
+def format_word(word, positions):
+    """Join the syllables of word given its break positions with "-"."""
+    spans = syllable_spans(word, positions)
+    return "-".join(word[start:end] for start, end in spans)
+
+
+def parse_word(word, trie):
+    return format_word(word, break_positions(word, trie))
+
+
+class HyphenationCache:
+    """Least recently used cache of trie.match results.
+
+    Can be passed anywhere a trie is, so words that were seen recently skip
+    pattern matching entirely. At most maxSize words are kept.
+    """
+
+    def __init__(self, trie, maxSize=65536):
+        self.trie = trie
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
+    def __len__(self):
+        return len(self.entries)
 
-def process_enable1():
+    def match(self, word):
+        values = self.entries.get(word)
+        if values is not None:
+            self.hits += 1
+            self.entries.move_to_end(word)
+            return values
+        self.misses += 1
+        values = self.trie.match(word)
+        self.entries[word] = values
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+        return values
+
+    def break_positions_batch(self, words):
+        """Return the break_positions of every word, like
+        batch_break_positions. The words that are not cached are matched
+        in one batch if the trie can."""
+        entries = self.entries
+        missing = [word for word in dict.fromkeys(words)
+                   if word not in entries]
+        if missing and hasattr(self.trie, "match_batch"):
+            rows = self.trie.match_batch(missing).tolist()
+        else:
+            rows = [self.trie.match(word) for word in missing]
+        fetched = dict(zip(missing, rows))
+        self.misses += len(missing)
+        self.hits += len(words) - len(missing)
+
+        positions = []
+        for word in words:
+            values = fetched.get(word)
+            if values is None:
+                values = entries[word]
+                entries.move_to_end(word)
+            positions.append(odd_positions(word, values))
+        entries.update(fetched)
+        while len(entries) > self.maxSize:
+            entries.popitem(last=False)
+        return positions
+
+    @property
+    def exceptions(self):
+        return self.trie.exceptions
+
+    def patterns(self):
+        return self.trie.patterns()
+
+    def save(self, fileName):
+        """Write the cached words, least recently used first."""
+        digest = getattr(self.trie, "digest", None)
+        with open(fileName, "wb") as file:
+            pickle.dump((digest, list(self.entries.items())), file)
+
+    def load(self, fileName):
+        """Add the entries of a saved cache, if its patterns match.
+
+        Return whether the file was used.
+        """
+        try:
+            with open(fileName, "rb") as file:
+                digest, entries = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        if digest != getattr(self.trie, "digest", None):
+            return False
+        for word, values in entries[-self.maxSize:]:
+            self.entries[word] = values
+            self.entries.move_to_end(word)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+        return True
+
+
+# Matcher used by hyphenate_chunk, loaded once per worker process
+workerTrie = None
+
+
+def load_worker_trie(fileName, engine, cacheSize=0, exceptionsFile=None):
+    trie = load_patterns(fileName, engine, exceptionsFile=exceptionsFile)
+    if cacheSize > 0:
+        trie = HyphenationCache(trie, cacheSize)
+    return trie
+
+
+def init_worker(fileName, engine, cacheSize=0, exceptionsFile=None):
+    """Pool initializer: load the patterns of this worker process."""
+    global workerTrie
+    workerTrie = load_worker_trie(fileName, engine, cacheSize, exceptionsFile)
+
+
+def collect_stats(function, words, keep):
+    """Run function on a chunk of words in a worker process, and return its
+    result with the MatchStats collected meanwhile."""
+    global matchStats
+    matchStats = MatchStats(keep)
+    try:
+        return function(words), matchStats
+    finally:
+        matchStats = None
+
+
+# Chunk functions use `trie` when given, else the worker process's trie
+
+
+def break_positions_chunk(words, trie=None):
+    trie = workerTrie if trie is None else trie
+    return batch_break_positions(words, trie)
+
+
+def hyphenate_chunk(words, trie=None):
+    trie = workerTrie if trie is None else trie
+    positions = batch_break_positions(words, trie)
+    return [format_word(word, breaks)
+            for word, breaks in zip(words, positions)]
+
+
+def count_hyphens_chunk(words, trie=None):
+    trie = workerTrie if trie is None else trie
+    hyphenCounts = Counter()
+    for breaks in batch_break_positions(words, trie):
+        hyphenCounts[len(breaks)] += 1
+    return hyphenCounts
+
+
+def count_pairs_chunk(words, syllables=None, trie=None):
+    trie = workerTrie if trie is None else trie
+    positions = batch_break_positions(words, trie)
+    return count_pairs(zip(words, positions), syllables)
+
+
+def read_words(lines):
+    """Lazily strip each line, skipping blank ones."""
+    for line in lines:
+        word = line.strip()
+        if word:
+            yield word
+
+
+def map_chunks(function, words, fileName="patterns.txt",
+               engine=DEFAULT_ENGINE, workers=None, chunkSize=2000,
+               cacheSize=0, exceptionsFile=None):
+    """Yield function(chunk) for each chunk of words, in input order.
+
+    words can be any iterable; it is consumed one chunk at a time. Chunks
+    are spread over a pool of `workers` processes (all cores by default),
+    each of which loads the patterns once, with at most two chunks per
+    worker in flight. With a single worker everything runs in this
+    process. function must accept a `trie` keyword argument, like the
+    *_chunk functions, which is passed the patterns when running in this
+    process. A positive cacheSize puts a HyphenationCache of that many
+    words in front of each worker's patterns, and exceptionsFile is
+    passed on to load_patterns. While statistics are enabled (see
+    enable_stats), the workers return theirs with each chunk, and they are
+    merged into this process's matchStats.
+    """
+    workers = workers or os.cpu_count() or 1
+    words = iter(words)
+    chunks = iter(lambda: list(islice(words, chunkSize)), [])
+    # Don't load the patterns or start a pool when there is nothing to do
+    first = next(chunks, None)
+    if first is None:
+        return
+    chunks = chain([first], chunks)
+    if workers == 1:
+        # Keep the patterns local to this generator, so other streams in
+        # this process can't swap them out while it is suspended
+        trie = load_worker_trie(fileName, engine, cacheSize, exceptionsFile)
+        function = partial(function, trie=trie)
+        for chunk in chunks:
+            yield function(chunk)
+        return
+    initArgs = (fileName, engine, cacheSize, exceptionsFile)
+    with Pool(workers, init_worker, initArgs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if matchStats is None:
+                pending.append((None, pool.apply_async(function, (chunk,))))
+            else:
+                args = (function, chunk, matchStats.keep)
+                pending.append((matchStats,
+                                pool.apply_async(collect_stats, args)))
+            if len(pending) >= 2 * workers:
+                yield merge_chunk(*pending.popleft())
+        while pending:
+            yield merge_chunk(*pending.popleft())
+
+
+def merge_chunk(stats, result):
+    """Return the result of a map_chunks chunk, merging the worker's
+    statistics into stats if they were collected."""
+    if stats is None:
+        return result.get()
+    result, chunkStats = result.get()
+    stats.merge(chunkStats)
+    return result
+
+
+def hyphenate_stream(lines, workers=1, **options):
+    """Lazily yield parse_word of every non-blank line, in input order.
+
+    Only a bounded number of chunks is held in memory at once, so lines can
+    be an open file of any size. Set workers to hyphenate in parallel;
+    other keyword arguments are passed to map_chunks.
+    """
+    for chunk in map_chunks(hyphenate_chunk, read_words(lines),
+                            workers=workers, **options):
+        yield from chunk
+
+
+def hyphenate_batch(words, workers=None, **options):
+    """Return parse_word of every word, computed across processes.
+
+    Accepts the keyword arguments of map_chunks.
+    """
+    results = []
+    for chunk in map_chunks(hyphenate_chunk, words, workers=workers,
+                            **options):
+        results.extend(chunk)
+    return results
+
+
+def hyphen_histogram(words, **options):
+    """Return a Counter of how many words have each number of hyphens."""
+    hyphenCounts = Counter()
+    for chunkCounts in map_chunks(count_hyphens_chunk, words, **options):
+        hyphenCounts.update(chunkCounts)
+    return hyphenCounts
+
+
+def syllable_pair_counts(words, syllables=None, **options):
+    """Return a Counter of adjacent syllable pairs across all words.
+
+    If syllables is given, only pairs where both syllables are in it are
+    counted. Pairs keep the order in which they first appear in words.
+    """
+    function = partial(count_pairs_chunk, syllables=syllables)
+    pairCounts = Counter()
+    for chunkCounts in map_chunks(function, words, **options):
+        pairCounts.update(chunkCounts)
+    return pairCounts
+
+
+def process_enable1(workers=None):
     start = time.time()
-    trie = read_patterns_file()
+    # Imported here since corpus builds on this module
+    from corpus import open_corpus
     hyphenCounts = {key: 0 for key in range(0, 10)}
-    content = []
-    with open("enable1.txt") as file:
-        content = [line.rstrip() for line in file]
-        file.close()
-    for line in content:
-        result = parse_word(line, trie)
-        amount = result.count("-")
-        hyphenCounts[amount] += 1
+    hyphenCounts.update(open_corpus(workers=workers).hyphen_histogram())
     print(hyphenCounts)
     end = time.time()
     print(str(end - start) + " Seconds to process enable1 List")
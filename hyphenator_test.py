@@ -0,0 +1,524 @@
+#!python
+
+from hyphenator import read_patterns_file, parse_word, Automaton, ArrayTrie
+from hyphenator import hyphenate_batch, hyphen_histogram, syllable_pair_counts
+from hyphenator import hyphenate_stream, break_positions, break_mask
+from hyphenator import syllable_spans, syllable_count, syllable_pairs
+from hyphenator import HyphenationCache, read_exceptions_file
+from hyphenator import batch_break_positions, PatternRegistry
+from hyphenator import MatchStats, enable_stats, disable_stats, build_trie
+from hyphenator import load_patterns
+import hyphenator
+from collections import Counter
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PATTERNS = os.path.join(HERE, "patterns.txt")
+ENABLE1 = os.path.join(HERE, "enable1.txt")
+EXCEPTIONS = os.path.join(HERE, "exceptions.txt")
+
+
+def write_spread_patterns(fileName):
+    """Write patterns for a made-up language that breaks between every pair
+    of letters."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    with open(fileName, "w") as file:
+        file.write("\n".join(f"{a}1{b}" for a in letters for b in letters))
+
+
+def sample_words(step=40):
+    with open(ENABLE1) as file:
+        return [line.rstrip() for line in file][::step]
+
+
+class AutomatonTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trie = read_patterns_file(PATTERNS, engine="trie")
+        cls.automaton = Automaton(cls.trie)
+
+    def test_parse_word(self):
+        assert parse_word("hyphenation", self.automaton) == "hy-phen-ation"
+        assert parse_word("syllable", self.automaton) == "syl-la-ble"
+        assert parse_word("a", self.automaton) == "a"
+        assert parse_word("", self.automaton) == ""
+
+    def test_unknown_letters(self):
+        # Letters outside the pattern alphabet never match
+        assert parse_word("ex-ample", self.automaton) == \
+            parse_word("ex-ample", self.trie)
+        assert parse_word("NAME", self.automaton) == "NAME"
+
+    def test_matches_trie(self):
+        for word in sample_words():
+            self.assertEqual(parse_word(word, self.automaton),
+                             parse_word(word, self.trie), word)
+
+
+class BreakPositionsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trie = read_patterns_file(PATTERNS)
+
+    def test_break_positions(self):
+        assert break_positions("hyphenation", self.trie) == [2, 6]
+        assert break_mask("hyphenation", self.trie) == 0b1000100
+        assert break_positions("a", self.trie) == []
+        assert break_mask("", self.trie) == 0
+
+    def test_syllable_spans(self):
+        assert syllable_spans("hyphenation", [2, 6]) == \
+            [(0, 2), (2, 6), (6, 11)]
+        assert syllable_spans("a", []) == [(0, 1)]
+
+    def test_syllable_count(self):
+        assert syllable_count("hyphenation", self.trie) == 3
+        assert syllable_count("a", self.trie) == 1
+        assert syllable_count("", self.trie) == 0
+
+    def test_syllable_pairs(self):
+        self.assertListEqual(list(syllable_pairs("hyphenation", self.trie)),
+                             [("hy", "phen"), ("phen", "ation")])
+        self.assertListEqual(list(syllable_pairs("a", self.trie)), [])
+
+    def test_consistent_with_parse_word(self):
+        for word in sample_words(100):
+            syllables = parse_word(word, self.trie).split("-")
+            self.assertEqual(syllable_count(word, self.trie), len(syllables))
+            self.assertListEqual(list(syllable_pairs(word, self.trie)),
+                                 list(zip(syllables, syllables[1:])))
+
+
+class HyphenationCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trie = read_patterns_file(PATTERNS)
+
+    def test_hits_and_misses(self):
+        cache = HyphenationCache(self.trie, maxSize=2)
+        assert parse_word("hyphenation", cache) == "hy-phen-ation"
+        assert parse_word("hyphenation", cache) == "hy-phen-ation"
+        assert (cache.hits, cache.misses) == (1, 1)
+        parse_word("syllable", cache)
+        assert len(cache) == 2
+
+    def test_least_recently_used_evicted(self):
+        cache = HyphenationCache(self.trie, maxSize=2)
+        cache.match("one")
+        cache.match("two")
+        cache.match("one")
+        cache.match("three")
+        self.assertListEqual(list(cache.entries), ["one", "three"])
+        cache.match("two")
+        assert cache.misses == 4
+
+    def test_batches_misses(self):
+        words = sample_words(500) + ["hyphenation", "hyphenation"]
+        for engine in ("aho-corasick", "numpy"):
+            trie = read_patterns_file(PATTERNS, engine)
+            expected = batch_break_positions(words, trie)
+            cache = HyphenationCache(trie, maxSize=len(words) - 10)
+            if engine == "numpy":
+                # Misses are matched together, not one word at a time
+                trie.match = None
+            self.assertListEqual(batch_break_positions(words, cache),
+                                 expected)
+            assert (cache.hits, cache.misses) == (1, len(words) - 1)
+            assert len(cache) == len(words) - 10
+            self.assertListEqual(batch_break_positions(words[-20:], cache),
+                                 expected[-20:])
+            assert cache.hits == 21
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(directory, "words.cache")
+            cache = HyphenationCache(self.trie)
+            for word in sample_words(1000):
+                cache.match(word)
+            cache.save(fileName)
+
+            loaded = HyphenationCache(self.trie, maxSize=10)
+            assert loaded.load(fileName)
+            self.assertListEqual(list(loaded.entries),
+                                 list(cache.entries)[-10:])
+            parse_word(list(cache.entries)[-1], loaded)
+            assert loaded.hits == 1
+
+            # Entries made with other patterns are not reused
+            other = HyphenationCache(read_patterns_file(PATTERNS, "trie"))
+            other.trie.digest = b"other"
+            assert not other.load(fileName)
+            assert len(other) == 0
+        finally:
+            shutil.rmtree(directory)
+
+
+class ExceptionsTest(unittest.TestCase):
+
+    def test_read_exceptions_file(self):
+        exceptions = read_exceptions_file(EXCEPTIONS)
+        assert exceptions["associate"] == (2, 4)
+        assert exceptions["present"] == ()
+        assert len(exceptions) == 14
+
+    def test_exceptions_bypass_patterns(self):
+        for engine in ("trie", "array-trie", "aho-corasick"):
+            trie = read_patterns_file(PATTERNS, engine,
+                                      exceptionsFile=EXCEPTIONS)
+            assert parse_word("associate", trie) == "as-so-ciate"
+            assert parse_word("table", trie) == "ta-ble"
+            assert parse_word("presents", trie) == "presents"
+            assert break_positions("table", trie) == [2]
+            # Other words still use the patterns
+            assert parse_word("hyphenation", trie) == "hy-phen-ation"
+
+        cache = HyphenationCache(trie)
+        assert parse_word("table", cache) == "ta-ble"
+        assert cache.misses == 0
+
+    def test_exceptions_per_instance(self):
+        for engine in ("trie", "array-trie", "aho-corasick", "substring"):
+            trie = load_patterns(PATTERNS, engine)
+            trie.exceptions["hyphenation"] = (1,)
+            other = load_patterns(PATTERNS, engine)
+            assert parse_word("hyphenation", other) == "hy-phen-ation"
+
+    def test_batch_with_exceptions(self):
+        results = hyphenate_batch(["table", "hyphenation"], fileName=PATTERNS,
+                                  workers=2, exceptionsFile=EXCEPTIONS)
+        self.assertListEqual(results, ["ta-ble", "hy-phen-ation"])
+
+
+class SubstringTableTest(unittest.TestCase):
+
+    def test_matches_trie(self):
+        trie = read_patterns_file(PATTERNS, engine="trie")
+        table = read_patterns_file(PATTERNS, engine="substring")
+        assert table.maxLength == 8
+        assert table.table[".ach"] == ((3, 4),)
+        assert table.table[".ac"] == ()
+        for word in sample_words() + ["", "NAME", "ex-ample"]:
+            self.assertEqual(parse_word(word, table), parse_word(word, trie),
+                             word)
+
+
+@unittest.skipIf(hyphenator.numpy is None, "numpy is not installed")
+class NumpyEngineTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trie = read_patterns_file(PATTERNS, engine="trie")
+        cls.engine = read_patterns_file(PATTERNS, engine="numpy")
+
+    def test_parse_word(self):
+        assert parse_word("hyphenation", self.engine) == "hy-phen-ation"
+        assert parse_word("", self.engine) == ""
+        assert parse_word("NAME", self.engine) == "NAME"
+        assert parse_word("caf\u00e9s", self.engine) == \
+            parse_word("caf\u00e9s", self.trie)
+
+    def test_batch_matches_trie(self):
+        words = sample_words() + ["", "a", "ex-ample", "supercalifragilistic"]
+        expected = [break_positions(word, self.trie) for word in words]
+        self.assertListEqual(self.engine.break_positions_batch(words),
+                             expected)
+        self.assertListEqual(batch_break_positions(words, self.engine),
+                             expected)
+        self.assertListEqual(batch_break_positions([], self.engine), [])
+
+    def test_batch_with_exceptions(self):
+        engine = read_patterns_file(PATTERNS, engine="numpy",
+                                    exceptionsFile=EXCEPTIONS)
+        self.assertListEqual(
+            batch_break_positions(["table", "hyphenation"], engine),
+            [[2], [2, 6]])
+        results = hyphenate_batch(["table", "hyphenation"], fileName=PATTERNS,
+                                  engine="numpy", workers=1)
+        self.assertListEqual(results, ["table", "hy-phen-ation"])
+
+
+class ArrayTrieTest(unittest.TestCase):
+
+    def test_add_and_get(self):
+        trie = ArrayTrie()
+        trie.add(".ach4")
+        trie.add("a1b")
+        node = trie.child(trie.child(trie.get("."), "a"), "c")
+        assert trie.child(node, "h") != -1
+        assert trie.isWord[trie.child(node, "h")]
+        assert trie.get_value(trie.child(node, "h")) == {3: 4}
+        assert trie.get_value(trie.child(trie.get("a"), "b")) == {1: 1}
+        assert trie.get("z") == -1
+        assert trie.get("A") == -1
+        with self.assertRaises(ValueError):
+            trie.add("x1Y")
+
+    def test_patterns_match_trie(self):
+        array_trie = read_patterns_file(PATTERNS, engine="array-trie")
+        trie = read_patterns_file(PATTERNS, engine="trie")
+        self.assertDictEqual(dict(array_trie.patterns()),
+                             dict(trie.patterns()))
+        for word in sample_words():
+            self.assertEqual(parse_word(word, array_trie),
+                             parse_word(word, trie), word)
+
+
+class PatternRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.other = os.path.join(self.directory, "xx.txt")
+        write_spread_patterns(self.other)
+
+    def test_lazy_loading(self):
+        registry = PatternRegistry(cache=False)
+        registry.register("en", PATTERNS, EXCEPTIONS)
+        registry.register("xx", self.other)
+        assert "xx" in registry and "fr" not in registry
+        self.assertListEqual(registry.languages(), ["en", "xx"])
+        assert len(registry) == 0 and registry.loads == 0
+
+        en = registry.get("en")
+        assert registry.get("en") is en
+        assert parse_word("hyphenation", en) == "hy-phen-ation"
+        assert parse_word("table", en) == "ta-ble"
+        assert parse_word("abc", registry.get("xx")) == "a-b-c"
+        assert registry.loads == 2
+        with self.assertRaises(KeyError):
+            registry.get("fr")
+
+        # Replacing the files of a language reloads it
+        registry.register("xx", PATTERNS)
+        assert parse_word("abc", registry.get("xx")) == "abc"
+        assert registry.loads == 3
+
+    def test_eviction(self):
+        registry = PatternRegistry(cache=False)
+        registry.register("en", PATTERNS)
+        registry.register("xx", self.other)
+        registry.get("en")
+        registry.get("xx")
+        # Room for both
+        assert len(registry) == 2
+        assert registry.nbytes() > 0
+
+        # Room for one: the least recently used set is dropped
+        registry.maxBytes = max(registry.sizes.values())
+        registry.get("en")
+        registry.evict()
+        self.assertListEqual(list(registry.loaded), ["en"])
+        registry.get("xx")
+        self.assertListEqual(list(registry.loaded), ["xx"])
+        assert registry.loads == 3
+
+        # A set bigger than the limit is still returned
+        registry.maxBytes = 0
+        assert parse_word("syllable", registry.get("en")) == "syl-la-ble"
+        self.assertListEqual(list(registry.loaded), ["en"])
+
+    def test_threads(self):
+        registry = PatternRegistry(cache=False)
+        registry.register("en", PATTERNS)
+        registry.register("xx", self.other)
+        results = []
+
+        def work(language):
+            results.append(parse_word("syllable", registry.get(language)))
+
+        threads = [threading.Thread(target=work, args=(language,))
+                   for language in ["en", "xx"] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertCountEqual(results,
+                              ["syl-la-ble"] * 4 + ["s-y-l-l-a-b-l-e"] * 4)
+        # Each language was compiled once
+        assert registry.loads == 2
+
+    def test_default_registry(self):
+        assert "en" in hyphenator.registry
+        assert hyphenator.registry.files["en"][0] == PATTERNS
+
+
+class MatchStatsTest(unittest.TestCase):
+
+    def tearDown(self):
+        disable_stats()
+
+    def test_disabled_by_default(self):
+        assert hyphenator.matchStats is None
+        trie = read_patterns_file(PATTERNS, engine="trie")
+        assert parse_word("hyphenation", trie) == "hy-phen-ation"
+        assert disable_stats() is None
+
+    def test_report(self):
+        stats = enable_stats(MatchStats(slowest=2))
+        assert hyphenator.matchStats is stats
+        trie = build_trie(["hy3ph", "he2n", "1na", "n2at"])
+        words = ["hyphenation", "nation", "hyphen"]
+        for word in words:
+            parse_word(word, trie)
+        assert disable_stats() is stats
+
+        report = stats.report()
+        assert report["counters"]["patterns added"] == 4
+        assert report["timers"]["Trie.add"]["calls"] == 4
+        assert report["timers"]["break_positions"]["calls"] == 3
+        assert sum(report["latency_us"].values()) == 3
+        self.assertCountEqual(
+            [entry["word"] for entry in report["slowest_words"]],
+            [word for _, word in sorted(stats.slowest)])
+        assert len(report["slowest_words"]) == 2
+        # hyph, hen, na, nat in hyphenation; na, nat in nation; hyph, hen
+        # in hyphen. find_values tries every index with and without the
+        # end of word dot, so each one is matched twice
+        self.assertDictEqual(dict(report["top_patterns"]),
+                             {"hyph": 4, "hen": 4, "na": 4, "nat": 4})
+        assert report["counters"]["patterns matched"] == 16
+        assert report["counters"]["dict merges"] == 16
+        assert report["counters"]["nodes visited"] > 0
+        # Nothing is collected once disabled
+        parse_word("hyphenation", trie)
+        assert stats.timers["break_positions"][0] == 3
+        json.dumps(report)
+
+    def test_every_engine_and_worker(self):
+        words = ["hyphenation", "nation", "table", "hyphen"]
+        for engine in ("trie", "aho-corasick", "numpy"):
+            stats = enable_stats()
+            trie = read_patterns_file(PATTERNS, engine=engine)
+            batch_break_positions(words, trie)
+            assert stats.timers["break_positions"][0] == len(words)
+            assert sum(stats.latency.values()) == len(words)
+
+        # Worker processes send their statistics back with their chunks
+        for workers in (1, 2):
+            stats = enable_stats(MatchStats(slowest=3))
+            hyphenate_batch(words * 3, fileName=PATTERNS, engine="trie",
+                            workers=workers, chunkSize=2)
+            assert hyphenator.matchStats is stats
+            assert stats.timers["break_positions"][0] == 12
+            assert stats.counters["patterns matched"] > 0
+            assert len(stats.slowest) == 3
+
+
+class PatternCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.patterns = os.path.join(self.directory, "patterns.txt")
+        shutil.copy(PATTERNS, self.patterns)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cache_is_reused(self):
+        built = read_patterns_file(self.patterns)
+        assert os.path.exists(self.patterns + ".cache")
+        loaded = read_patterns_file(self.patterns)
+        assert isinstance(loaded.delta, memoryview)
+        for word in sample_words(400):
+            self.assertEqual(parse_word(word, loaded),
+                             parse_word(word, built), word)
+
+    def test_cache_rebuilt_when_patterns_change(self):
+        read_patterns_file(self.patterns)
+        assert parse_word("ducks", read_patterns_file(self.patterns)) == \
+            "duck-s"
+        with open(self.patterns, "a") as file:
+            file.write("\nduc5ks\n")
+        assert parse_word("ducks", read_patterns_file(self.patterns)) == \
+            "duc-k-s"
+
+    def test_corrupt_cache_is_ignored(self):
+        with open(self.patterns + ".cache", "wb") as file:
+            file.write(b"not a cache")
+        trie = read_patterns_file(self.patterns)
+        assert parse_word("hyphenation", trie) == "hy-phen-ation"
+
+
+class BatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.words = sample_words(200)
+        trie = read_patterns_file(PATTERNS)
+        cls.expected = [parse_word(word, trie) for word in cls.words]
+
+    def test_hyphenate_batch(self):
+        for workers in (1, 2):
+            results = hyphenate_batch(self.words, fileName=PATTERNS,
+                                      workers=workers, chunkSize=97)
+            self.assertListEqual(results, self.expected)
+        results = hyphenate_batch(self.words * 2, fileName=PATTERNS,
+                                  workers=1, cacheSize=100)
+        self.assertListEqual(results, self.expected * 2)
+
+    def test_hyphenate_stream(self):
+        lines = (word + "\n" for word in self.words)
+        stream = hyphenate_stream(lines, fileName=PATTERNS)
+        # Results are produced lazily
+        assert next(stream) == self.expected[0]
+        self.assertListEqual(list(stream), self.expected[1:])
+
+        lines = ["  " + word + " \n" for word in self.words] + ["\n"]
+        stream = hyphenate_stream(iter(lines), fileName=PATTERNS, workers=2,
+                                  chunkSize=7)
+        self.assertListEqual(list(stream), self.expected)
+
+    def test_interleaved_streams(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = os.path.join(directory, "xx.txt")
+        write_spread_patterns(other)
+        words = ["hyphenation", "syllable"] * 3
+        english = hyphenate_stream(iter(words), fileName=PATTERNS,
+                                   chunkSize=1)
+        assert next(english) == "hy-phen-ation"
+        spread = hyphenate_stream(iter(words), fileName=other, chunkSize=1)
+        assert next(spread) == "h-y-p-h-e-n-a-t-i-o-n"
+        # Each stream keeps its own patterns
+        assert next(english) == "syl-la-ble"
+        assert next(spread) == "s-y-l-l-a-b-l-e"
+        self.assertListEqual(list(english),
+                             ["hy-phen-ation", "syl-la-ble"] * 2)
+
+    def test_hyphen_histogram(self):
+        expected = Counter(word.count("-") for word in self.expected)
+        histogram = hyphen_histogram(self.words, fileName=PATTERNS,
+                                     workers=2, chunkSize=97)
+        self.assertDictEqual(histogram, expected)
+
+    def test_syllable_pair_counts(self):
+        expected = Counter()
+        for word in self.expected:
+            syllables = word.split("-")
+            expected.update(zip(syllables, syllables[1:]))
+        counts = syllable_pair_counts(self.words, fileName=PATTERNS,
+                                      workers=2, chunkSize=97)
+        self.assertDictEqual(counts, expected)
+        # Merged pairs keep the order they were first seen in
+        self.assertListEqual(list(counts), list(expected))
+
+        syllables = {"a", "er", "i", "in", "ing", "ly", "ter"}
+        filtered = syllable_pair_counts(self.words, syllables,
+                                        fileName=PATTERNS, workers=1)
+        assert len(filtered) > 0
+        self.assertDictEqual(filtered, {
+            pair: count for pair, count in expected.items()
+            if pair[0] in syllables and pair[1] in syllables})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,33 +1,22 @@
 import time
 import random
-from graph import Graph
-from hyphenator import read_patterns_file, parse_word
+from graph import Graph, read_edge_list
+from sketch import SpaceSaving
+from collections import Counter
+from corpus import CorpusStore, file_digest, open_corpus, tag_store
+from corpus import update_corpus
+from hyphenator import count_pairs, read_words, syllable_pair_counts
+from hyphenator import split_pairs, syllable_spans
 
 
-def get_edges(syllables):
+def get_edges(syllables, workers=None, store_file=None):
     """Get the edges by using the hyphenator."""
     start = time.time()
-    edges = {}
-    trie = read_patterns_file()
-
-    content = []
-    with open("enable1.txt") as file:
-        content = [line.rstrip() for line in file]
-        file.close()
-
-    for line in content:
-        result = parse_word(line, trie)
-        word_syllables = result.split("-")
-
-        for syl_ind in range(len(word_syllables) - 1):
-            pre_syl = word_syllables[syl_ind]
-            next_syl = word_syllables[syl_ind + 1]
-            if pre_syl in syllables and next_syl in syllables:
-                edge = (pre_syl, next_syl)
-                if edge in edges:
-                    edges[edge] += 1
-                else:
-                    edges[edge] = 1
+
+    # Count syllable pairs from the stored syllabified word list, which is
+    # only rebuilt (across worker processes) when an input file changed
+    store = open_corpus(store_file=store_file, workers=workers)
+    edges = store.syllable_pairs(syllables)
 
     end = time.time()
     print(f"{end - start} seconds to process enable1 List")
@@ -35,6 +24,167 @@ def get_edges(syllables):
     return edges
 
 
+def read_graph_file(file_name):
+    """Return the vertices and the {(from, to): weight} edges of a file
+    written by write_graph_file."""
+    vertices = []
+    edges = {}
+    for kind, data in read_edge_list(file_name):
+        if kind == "vertices":
+            vertices = data
+        elif kind == "edges":
+            for from_vert, to_vert, weight in data:
+                edges[(from_vert, to_vert)] = weight
+    return vertices, edges
+
+
+def write_graph_file(file_name, vertices, edges):
+    """Write a weighted digraph in the format read by make_graph_from_file."""
+    with open(file_name, "w") as file:
+        file.write("D\n")
+        file.write(",".join(vertices) + "\n")
+        for edge in edges:
+            data = f"({edge[0]},{edge[1]},{edges[edge]})\n"
+            file.write(data)
+
+
+def update_edges(graph_file="syllable_graph.txt", word_file="enable1.txt",
+                 patterns_file="patterns.txt", workers=None):
+    """Update the edge weights in graph_file after word_file changed.
+
+    Only the words added since graph_file was last written are hyphenated,
+    and the pairs of removed words are subtracted. The vertices of
+    graph_file are kept as the vocabulary. The word list the graph was
+    last built from is remembered in graph_file + ".corpus", tagged with
+    the digest of the graph file it was counted into. Without it, or if
+    graph_file has been written by anything else since (its vertices or
+    edges changed), every pair is recounted. Return the Counter of edges.
+    """
+    start = time.time()
+    vertices, edges = read_graph_file(graph_file)
+    syllables = set(vertices)
+    store_file = graph_file + ".corpus"
+    snapshot = CorpusStore.load(store_file)
+    matches = snapshot is not None and snapshot.tag == file_digest(graph_file)
+
+    store, added, removed = update_corpus(
+        word_file, patterns_file, store_file, workers=workers)
+    if added is None or not matches:
+        edges = store.syllable_pairs(syllables)
+    else:
+        edges = Counter(edges)
+        edges.update(count_pairs(added, syllables))
+        edges.subtract(count_pairs(removed, syllables))
+        # Drop the pairs whose words are all gone
+        edges = +edges
+
+    write_graph_file(graph_file, vertices, edges)
+    try:
+        tag_store(store_file, file_digest(graph_file))
+    except OSError:
+        pass
+
+    end = time.time()
+    print(f"{end - start} seconds to update {graph_file}")
+    return edges
+
+
+def graph_from_edges(vertices, edges):
+    """Return a weighted digraph of vertices and {(from, to): weight}."""
+    graph = Graph(weighted=True, directed=True)
+    for vertex in vertices:
+        graph.add_vertex(vertex)
+    graph.add_edges((edge[0], edge[1], weight)
+                    for edge, weight in edges.items())
+    return graph
+
+
+def build_syllable_graph(syllables=None, word_file="enable1.txt",
+                         graph_file=None, workers=None, chunk_size=2000):
+    """Build the syllable graph of word_file with a parallel map-reduce.
+
+    The words are split into chunks across worker processes, which each
+    count the syllable pairs of their chunk. The partial counts are merged
+    in input order, so the edges come out in the same order as in the
+    serial get_edges. Only pairs of the given syllables are kept, or every
+    pair if syllables is None. Return the graph and its edges, and also
+    write them to graph_file if one is given.
+    """
+    vocabulary = None if syllables is None else set(syllables)
+    with open(word_file) as file:
+        edges = syllable_pair_counts(read_words(file), vocabulary,
+                                     workers=workers, chunkSize=chunk_size)
+
+    if syllables is None:
+        # Vertices in the order they first appear in an edge
+        syllables = list(dict.fromkeys(vert for edge in edges
+                                       for vert in edge))
+    graph = graph_from_edges(syllables, edges)
+    if graph_file is not None:
+        write_graph_file(graph_file, syllables, edges)
+    return graph, edges
+
+
+def build_full_graph(entries):
+    """Build the syllable graph over every syllable in entries.
+
+    entries are (word, break positions), such as a CorpusStore, and are
+    streamed once. Syllables are interned to integer ids as they are met,
+    and pair counts go straight into per-syllable {id: count} rows, so no
+    pair tuples are created. The Graph is built from the rows at the end,
+    see Graph.from_rows.
+    """
+    ids = {}
+    names = []
+    rows = []
+    for word, positions in entries:
+        previous = None
+        for start, end in syllable_spans(word, positions):
+            syllable = word[start:end]
+            current = ids.get(syllable)
+            if current is None:
+                current = ids[syllable] = len(names)
+                names.append(syllable)
+                rows.append({})
+            if previous is not None:
+                row = rows[previous]
+                row[current] = row.get(current, 0) + 1
+            previous = current
+
+    return Graph.from_rows(names, rows, directed=True, weighted=True)
+
+
+def discover_vocabulary(entries, k=30, capacity=None):
+    """Find the k most frequent syllables and syllable pairs in one pass.
+
+    entries are (word, break positions), such as a CorpusStore. Counts are
+    kept in Space-Saving sketches of `capacity` items (20 * k by default),
+    so memory does not grow with the number of distinct syllables. Return
+    two lists of (item, count, error), where the true count of each item is
+    between count - error and count, most frequent first. Pass the
+    syllables through vocabulary to get the syllables for
+    build_syllable_graph.
+    """
+    capacity = capacity or 20 * k
+    syllables = SpaceSaving(capacity)
+    pairs = SpaceSaving(capacity)
+    for word, positions in entries:
+        for start, end in syllable_spans(word, positions):
+            syllables.update(word[start:end])
+        for pair in split_pairs(word, positions):
+            pairs.update(pair)
+    return syllables.top(k), pairs.top(k)
+
+
+def vocabulary(top):
+    """Return the items of a list of (item, count, error), in order.
+
+    This turns the syllables from discover_vocabulary into the syllables
+    argument of build_syllable_graph.
+    """
+    return [item for item, _, _ in top]
+
+
 def old_main():
     """Old code for creating graph using hyphenator."""
     common_syllables = ['ing', 'er', 'a', 'ly', 'ed', 'i', 'es', 're', 'tion',
@@ -43,27 +193,14 @@ def old_main():
                         'be', 'per', 'to']
     syllables_set = set(common_syllables)
 
-    graph = Graph(weighted=True, directed=True)
-
-    # Make graph using hyphenator
-    for syllable in common_syllables:
-        graph.add_vertex(syllable)
-
-    edges = get_edges(syllables_set)
-    for edge in edges:
-        from_vert = edge[0]
-        to_vert = edge[1]
-        weight = edges[edge]
-        graph.add_edge(from_vert, to_vert, weight)
+    # Make graph using hyphenator, remembering the word list next to the
+    # graph for update_edges
+    edges = get_edges(syllables_set,
+                      store_file="syllable_graph.txt.corpus")
+    graph = graph_from_edges(common_syllables, edges)
 
     # Write edge info to graph
-    with open("syllable_graph.txt", "w") as file:
-        file.write("D\n")
-        vertices = ",".join(common_syllables)
-        file.write(vertices + "\n")
-        for edge in edges:
-            data = f"({edge[0]},{edge[1]},{edges[edge]})\n"
-            file.write(data)
+    write_graph_file("syllable_graph.txt", common_syllables, edges)
 
     verify_graph(graph)
 
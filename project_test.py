@@ -0,0 +1,183 @@
+#!python
+
+from project import update_edges, read_graph_file, write_graph_file
+from project import build_syllable_graph, build_full_graph
+from project import discover_vocabulary, vocabulary
+from hyphenator import read_patterns_file, parse_word
+from corpus import open_corpus
+from collections import Counter
+import os
+import shutil
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PATTERNS = os.path.join(HERE, "patterns.txt")
+ENABLE1 = os.path.join(HERE, "enable1.txt")
+SYLLABLES = ["a", "al", "er", "i", "ing", "ly", "re", "ri", "tion", "ty"]
+
+
+class UpdateEdgesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.words = os.path.join(self.directory, "words.txt")
+        self.graph = os.path.join(self.directory, "graph.txt")
+        with open(ENABLE1) as file:
+            self.enable1 = [line.rstrip() for line in file][::50]
+        write_graph_file(self.graph, SYLLABLES, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_words(self, words):
+        with open(self.words, "w") as file:
+            file.write("\n".join(words) + "\n")
+
+    def full_count(self, vertices=SYLLABLES):
+        store = open_corpus(self.words, PATTERNS,
+                            os.path.join(self.directory, "full.corpus"),
+                            workers=1)
+        return store.syllable_pairs(set(vertices))
+
+    def update(self):
+        return update_edges(self.graph, self.words, PATTERNS, workers=1)
+
+    def test_read_write_graph_file(self):
+        edges = {("a", "ly"): 3, ("er", "ing"): 1}
+        write_graph_file(self.graph, SYLLABLES, edges)
+        vertices, read_edges = read_graph_file(self.graph)
+        self.assertListEqual(vertices, SYLLABLES)
+        self.assertDictEqual(read_edges, edges)
+        self.assertListEqual(list(read_edges), list(edges))
+
+    def test_incremental_update_matches_full_count(self):
+        # The first run has nothing to diff against, so counts everything
+        self.write_words(self.enable1[:2000])
+        edges = self.update()
+        assert len(edges) > 0
+        self.assertDictEqual(dict(edges), dict(self.full_count()))
+
+        # Words are added, removed and duplicated
+        words = self.enable1[500:] + self.enable1[600:700]
+        self.write_words(words)
+        edges = self.update()
+        self.assertDictEqual(edges, dict(self.full_count()))
+        self.assertDictEqual(read_graph_file(self.graph)[1], edges)
+        self.assertListEqual(read_graph_file(self.graph)[0], SYLLABLES)
+
+        # Pairs that lose all their words are dropped
+        self.write_words(self.enable1[:10])
+        edges = self.update()
+        self.assertDictEqual(edges, dict(self.full_count()))
+
+    def test_graph_rewritten_since_snapshot(self):
+        self.write_words(self.enable1[:1000])
+        self.update()
+        # The graph is rebuilt from changed words behind update_edges' back
+        self.write_words(self.enable1[500:1500])
+        build_syllable_graph(SYLLABLES, self.words, graph_file=self.graph,
+                             workers=1)
+        edges = self.update()
+        assert isinstance(edges, Counter)
+        self.assertDictEqual(edges, dict(self.full_count()))
+
+        # A changed vocabulary is counted against every word
+        vertices = SYLLABLES[:-1] + ["ness"]
+        write_graph_file(self.graph, vertices, edges)
+        edges = self.update()
+        self.assertDictEqual(edges, dict(self.full_count(vertices)))
+        assert any("ness" in edge for edge in edges)
+
+        # The incremental path returns a Counter too
+        self.write_words(self.enable1[600:1500])
+        edges = self.update()
+        assert isinstance(edges, Counter)
+        self.assertDictEqual(edges, dict(self.full_count(vertices)))
+
+    def test_unchanged_word_list(self):
+        self.write_words(self.enable1[:500])
+        edges = self.update()
+        self.assertDictEqual(self.update(), dict(edges))
+
+
+class BuildSyllableGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.words = os.path.join(self.directory, "words.txt")
+        with open(ENABLE1) as file:
+            self.enable1 = [line.rstrip() for line in file][::20]
+        with open(self.words, "w") as file:
+            file.write("\n".join(self.enable1) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def serial_edges(self, syllables):
+        # The original get_edges loop
+        trie = read_patterns_file(PATTERNS)
+        edges = {}
+        for line in self.enable1:
+            word_syllables = parse_word(line, trie).split("-")
+            for syl_ind in range(len(word_syllables) - 1):
+                edge = (word_syllables[syl_ind], word_syllables[syl_ind + 1])
+                if syllables is None or (edge[0] in syllables
+                                         and edge[1] in syllables):
+                    edges[edge] = edges.get(edge, 0) + 1
+        return edges
+
+    def test_same_file_as_serial(self):
+        serial_file = os.path.join(self.directory, "serial.txt")
+        write_graph_file(serial_file, SYLLABLES, self.serial_edges(SYLLABLES))
+
+        graph_file = os.path.join(self.directory, "graph.txt")
+        graph, edges = build_syllable_graph(SYLLABLES, self.words, graph_file,
+                                            workers=2, chunk_size=500)
+        with open(serial_file) as serial, open(graph_file) as parallel:
+            assert serial.read() == parallel.read()
+        assert graph.num_vertices == len(SYLLABLES)
+        for (from_vert, to_vert), weight in edges.items():
+            from_vert = graph.get_vertex(from_vert)
+            assert from_vert.get_edge_weight(graph.get_vertex(to_vert)) == \
+                weight
+
+    def test_without_vocabulary(self):
+        graph, edges = build_syllable_graph(None, self.words, workers=1)
+        self.assertDictEqual(dict(edges), self.serial_edges(None))
+        assert graph.num_vertices == \
+            len({vert for edge in edges for vert in edge})
+
+    def test_build_full_graph(self):
+        store = open_corpus(self.words, PATTERNS, workers=1)
+        graph = build_full_graph(store)
+        edges = {}
+        for from_vert in graph:
+            for to_vert, weight in from_vert.neighbors.items():
+                edges[(from_vert.id, to_vert.id)] = weight
+        self.assertDictEqual(edges, self.serial_edges(None))
+        syllables = store.syllable_counts()
+        self.assertCountEqual(graph.vert_list, syllables)
+
+    def test_discover_vocabulary(self):
+        store = open_corpus(self.words, PATTERNS, workers=1)
+        exact_syllables = store.syllable_counts()
+        exact_pairs = store.syllable_pairs()
+        syllables, pairs = discover_vocabulary(store, k=10, capacity=100)
+        assert len(syllables) == len(pairs) == 10
+        for syllable, count, error in syllables:
+            assert count - error <= exact_syllables[syllable] <= count
+        for pair, count, error in pairs:
+            assert count - error <= exact_pairs[pair] <= count
+        # The most frequent syllable is far ahead of the rest
+        assert syllables[0][0] == exact_syllables.most_common(1)[0][0]
+
+        # The syllables, without their counts, feed the graph builder
+        graph, _ = build_syllable_graph(vocabulary(syllables), self.words,
+                                        workers=1)
+        assert graph.num_vertices == 10
+        self.assertListEqual(list(graph.vert_list), vocabulary(syllables))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import heapq
+
+
+class SpaceSaving:
+    """Space-Saving sketch of the most frequent items of a stream.
+
+    At most `capacity` items are monitored. When a new item arrives and
+    the sketch is full, the least counted item is replaced by it, and the
+    new item inherits that count as its possible overestimate (error). So
+    for every monitored item:
+        count - error <= true count <= count
+    and any item with a true count above total / capacity is monitored.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # (count, item) of every monitored item. Counts only grow, so an
+        # entry can be stale (too low) but is fixed when it reaches the top
+        self.heap = []
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, item):
+        return item in self.counts
+
+    def update(self, item, count=1):
+        """Count `count` more occurrences of item."""
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        error = 0
+        if len(self.counts) >= self.capacity:
+            error = self.evict()
+        self.counts[item] = error + count
+        self.errors[item] = error
+        heapq.heappush(self.heap, (error + count, item))
+
+    def evict(self):
+        """Stop monitoring the least counted item and return its count."""
+        while True:
+            count, item = self.heap[0]
+            if self.counts[item] == count:
+                heapq.heappop(self.heap)
+                del self.counts[item]
+                del self.errors[item]
+                return count
+            heapq.heapreplace(self.heap, (self.counts[item], item))
+
+    def error_bound(self):
+        """Return the largest possible overestimate of any count."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def top(self, k=None):
+        """Return the k most counted items as (item, count, error).
+
+        The true count of each item is between count - error and count.
+        """
+        ranked = sorted(self.counts.items(), key=lambda x: (-x[1], x[0]))
+        return [(item, count, self.errors[item])
+                for item, count in ranked[:k]]
+
+    def guaranteed_top(self, k):
+        """Return the items of top(k) that are certainly among the true
+        k most frequent items."""
+        ranked = self.top()
+        # An item is certain if its lowest possible count beats the highest
+        # possible count of everything ranked below position k
+        threshold = ranked[k][1] if len(ranked) > k else self.error_bound()
+        return [entry for entry in ranked[:k]
+                if entry[1] - entry[2] >= threshold]
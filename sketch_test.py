@@ -0,0 +1,69 @@
+#!python
+
+from sketch import SpaceSaving
+from collections import Counter
+import random
+import unittest
+
+
+def zipf_stream(length, distinct, seed=0):
+    rand = random.Random(seed)
+    weights = [1 / rank for rank in range(1, distinct + 1)]
+    return rand.choices(range(distinct), weights, k=length)
+
+
+class SpaceSavingTest(unittest.TestCase):
+
+    def test_exact_when_everything_fits(self):
+        sketch = SpaceSaving(10)
+        stream = "abracadabra"
+        for item in stream:
+            sketch.update(item)
+        self.assertListEqual(sketch.top(), [
+            ("a", 5, 0), ("b", 2, 0), ("r", 2, 0), ("c", 1, 0), ("d", 1, 0)])
+        assert sketch.error_bound() == 0
+        assert sketch.total == len(stream)
+
+    def test_eviction(self):
+        sketch = SpaceSaving(2)
+        sketch.update("a", 3)
+        sketch.update("b")
+        sketch.update("c")
+        # "b" had the lowest count, so "c" takes it over as its error
+        assert "b" not in sketch
+        self.assertListEqual(sketch.top(), [("a", 3, 0), ("c", 2, 1)])
+        assert len(sketch) == 2
+
+    def test_error_bounds(self):
+        stream = zipf_stream(20000, 2000)
+        exact = Counter(stream)
+        sketch = SpaceSaving(100)
+        for item in stream:
+            sketch.update(item)
+        assert len(sketch) == 100
+        assert sketch.error_bound() <= len(stream) / 100
+        for item, count, error in sketch.top():
+            assert count - error <= exact[item] <= count
+        # Every item more frequent than total / capacity is monitored
+        for item, count in exact.items():
+            if count > len(stream) / 100:
+                assert item in sketch
+
+    def test_guaranteed_top(self):
+        stream = zipf_stream(20000, 2000, seed=1)
+        exact = [item for item, _ in Counter(stream).most_common(10)]
+        sketch = SpaceSaving(200)
+        for item in stream:
+            sketch.update(item)
+        guaranteed = sketch.guaranteed_top(10)
+        assert len(guaranteed) > 0
+        for item, _, _ in guaranteed:
+            assert item in exact
+
+    def test_capacity(self):
+        with self.assertRaises(ValueError):
+            SpaceSaving(0)
+
+
+if __name__ == '__main__':
+    unittest.main()